@@ -6,7 +6,10 @@
 // ============ State ============
 let selectedNodeId = null;
 let treeData = [];
+let treeVersion = 0;       // Data version the cached tree reflects
+let nodeIndex = new Map(); // id -> node within treeData
 let iconList = [];
+let authLinks = [];     // Flat list from /api/auth-links/all, by region then order
 
 // ============ DOM Elements ============
 const treeContainer = document.getElementById('tree-container');
@@ -78,7 +81,9 @@ function setupThemeToggle() {
 async function loadTree() {
     try {
         const res = await fetch('/api/nodes/tree');
+        treeVersion = parseInt(res.headers.get('X-Data-Version')) || 0;
         treeData = await res.json();
+        indexTree(treeData);
         renderTree(treeData);
     } catch (err) {
         console.error('Failed to load tree:', err);
@@ -86,6 +91,83 @@ async function loadTree() {
     }
 }
 
+function indexTree(nodes) {
+    nodeIndex = new Map();
+    const walk = list => list.forEach(node => {
+        nodeIndex.set(node.id, node);
+        walk(node.children || []);
+    });
+    walk(nodes);
+}
+
+// Patch the cached tree with the changes since treeVersion
+async function syncTree() {
+    try {
+        const res = await fetch(`/api/changes?since=${treeVersion}`);
+        const feed = await res.json();
+        if (feed.reset) {
+            await loadTree();
+            return;
+        }
+
+        feed.deleted_nodes.forEach(id => detachNode(id));
+        feed.nodes.forEach(row => {
+            if (!row.is_active) {
+                detachNode(row.id);
+                return;
+            }
+            const node = nodeIndex.get(row.id);
+            if (node) {
+                if (node.parent_id !== row.parent_id) {
+                    detachNode(row.id);
+                    nodeIndex.set(row.id, node);
+                }
+                Object.assign(node, row);
+            } else {
+                nodeIndex.set(row.id, { ...row, children: [] });
+            }
+        });
+        // Attach after all upserts so a new parent in the same feed is found
+        const touched = new Set();
+        feed.nodes.forEach(row => {
+            const node = nodeIndex.get(row.id);
+            if (!node || !row.is_active) return;
+            const siblings = siblingsOf(node);
+            if (!siblings) {
+                nodeIndex.delete(row.id);
+                return;
+            }
+            if (!siblings.includes(node)) siblings.push(node);
+            touched.add(siblings);
+        });
+        touched.forEach(list => list.sort((a, b) =>
+            (a.sort_order - b.sort_order) || a.code.localeCompare(b.code)));
+
+        treeVersion = feed.version;
+        renderTree(treeData);
+    } catch (err) {
+        console.error('Failed to sync tree:', err);
+        await loadTree();
+    }
+}
+
+function siblingsOf(node) {
+    if (node.parent_id === null) return treeData;
+    const parent = nodeIndex.get(node.parent_id);
+    return parent ? parent.children : null;
+}
+
+function detachNode(id) {
+    const node = nodeIndex.get(id);
+    if (!node) return;
+    const siblings = siblingsOf(node);
+    if (siblings) {
+        const pos = siblings.indexOf(node);
+        if (pos >= 0) siblings.splice(pos, 1);
+    }
+    nodeIndex.delete(id);
+}
+
 function renderTree(nodes, container = treeContainer, isRoot = true) {
     container.innerHTML = '';
 
@@ -251,7 +333,7 @@ async function handleNodeSubmit(e) {
 
         if (res.ok) {
             showMessage('✓ 已儲存');
-            await loadTree();
+            await syncTree();
             selectNode(parseInt(id));
         } else {
             const err = await res.json();
@@ -276,7 +358,7 @@ async function handleNodeDelete() {
             selectedNodeId = null;
             nodeForm.style.display = 'none';
             editorPlaceholder.style.display = 'flex';
-            await loadTree();
+            await syncTree();
         }
     } catch (err) {
         showMessage('✗ 刪除失敗', true);
@@ -330,7 +412,7 @@ async function handleAddChildSubmit(e) {
             const newNode = await res.json();
             showMessage('✓ 已新增');
             closeAddChildModal();
-            await loadTree();
+            await syncTree();
 
             // Expand parent and select new node
             const parentItem = treeContainer.querySelector(`.tree-item[data-id="${selectedNodeId}"]`);
@@ -368,7 +450,7 @@ async function handleAddRoot() {
         if (res.ok) {
             const newNode = await res.json();
             showMessage('✓ 已新增根節點');
-            await loadTree();
+            await syncTree();
             selectNode(newNode.id);
         }
     } catch (err) {
@@ -406,6 +488,7 @@ async function loadAuthLinks() {
     try {
         const res = await fetch('/api/auth-links/all');
         const links = await res.json();
+        authLinks = links;
         renderAuthTable(links);
 
         // Populate region datalist
@@ -430,6 +513,8 @@ function renderAuthTable(links) {
       <td>${escapeHtml(link.name)}</td>
       <td><a href="${escapeHtml(link.url)}" target="_blank">${escapeHtml(link.url)}</a></td>
       <td class="actions">
+        <button class="btn btn-sm btn-secondary" onclick="moveAuthLink(${link.id}, -1)" title="上移">⬆️</button>
+        <button class="btn btn-sm btn-secondary" onclick="moveAuthLink(${link.id}, 1)" title="下移">⬇️</button>
         <button class="btn btn-sm btn-secondary" onclick="editAuthLink(${link.id})">✏️</button>
         <button class="btn btn-sm btn-danger" onclick="deleteAuthLink(${link.id})">🗑️</button>
       </td>
@@ -475,6 +560,36 @@ async function deleteAuthLink(id) {
     }
 }
 
+// Save a region's whole ordered list in one request
+async function saveAuthRegion(region, links) {
+    const res = await fetch(`/api/auth-links/regions/${encodeURIComponent(region)}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            items: links.map(l => ({ id: l.id, name: l.name, url: l.url, is_active: l.is_active }))
+        })
+    });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    return res.json();
+}
+
+async function moveAuthLink(id, delta) {
+    const link = authLinks.find(l => l.id === id);
+    if (!link) return;
+    const region = authLinks.filter(l => l.region === link.region);
+    const from = region.indexOf(link);
+    const to = from + delta;
+    if (to < 0 || to >= region.length) return;
+    [region[from], region[to]] = [region[to], region[from]];
+
+    try {
+        await saveAuthRegion(link.region, region);
+        await loadAuthLinks();
+    } catch (err) {
+        showMessage('✗ 排序失敗', true);
+    }
+}
+
 async function handleAuthSubmit(e) {
     e.preventDefault();
 
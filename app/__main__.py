@@ -0,0 +1,59 @@
+"""
+Tool Table - Production Server Entry Point
+Usage: python -m app [--host 0.0.0.0] [--port 8080] [--workers 4]
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+
+import uvicorn
+
+from .database import init_db
+
+def has_module(name: str) -> bool:
+    """Check whether an optional accelerator is installed"""
+    return importlib.util.find_spec(name) is not None
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m app", description="Tool Table server")
+    parser.add_argument("--host", default=os.environ.get("TOOL_TABLE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("TOOL_TABLE_PORT", "8080")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ.get("TOOL_TABLE_WORKERS", "1")),
+        help="number of worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int,
+        default=int(os.environ.get("TOOL_TABLE_GRACEFUL_TIMEOUT", "30")),
+        help="seconds to let in-flight requests finish on shutdown"
+    )
+    parser.add_argument("--log-level", default=os.environ.get("TOOL_TABLE_LOG_LEVEL", "info"))
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Preload: create/upgrade the schema once here rather than racing in
+    # every worker; each worker then warms its own derived data and only
+    # reports ready (/api/ready) once that is done
+    asyncio.run(init_db())
+
+    loop = "uvloop" if has_module("uvloop") else "asyncio"
+    http = "httptools" if has_module("httptools") else "h11"
+    print(f"Starting {args.workers} worker(s) on {args.host}:{args.port} (loop={loop}, http={http})")
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Admission Control for Tool Table
+Bounds how many API requests touch the database at once and sheds the rest
+
+Every API request opens its own aiosqlite connection (one file handle and
+one thread), so an unbounded spike slows every request down together.
+Requests are split into a read class (GET/HEAD) and a write class; each
+admits up to its limit at once and queues the rest in arrival order. A
+queued request that waits past the deadline, or arrives when the queue is
+full, gets an immediate 503 with Retry-After instead of adding to the pile.
+"""
+import asyncio
+import os
+from collections import deque
+from typing import Deque, Optional
+
+from . import tenancy
+
+# Requests of each class running at once (0 disables the limit)
+MAX_READS = int(os.environ.get("TOOL_TABLE_MAX_READS", "32"))
+MAX_WRITES = int(os.environ.get("TOOL_TABLE_MAX_WRITES", "8"))
+
+# Requests of each class waiting for a slot before new ones are rejected
+READ_QUEUE = int(os.environ.get("TOOL_TABLE_READ_QUEUE", "128"))
+WRITE_QUEUE = int(os.environ.get("TOOL_TABLE_WRITE_QUEUE", "64"))
+
+# Seconds a request may wait for a slot
+QUEUE_TIMEOUT = float(os.environ.get("TOOL_TABLE_QUEUE_TIMEOUT", "2"))
+
+# Retry-After sent with 503s, in seconds
+RETRY_AFTER = int(os.environ.get("TOOL_TABLE_RETRY_AFTER", "1"))
+
+READ_METHODS = {"GET", "HEAD"}
+
+# Cheap or long-lived requests that hold no connection while running:
+# probes, counters, event streams, and link scans (mostly network waits)
+EXEMPT_PATHS = {"/api/health", "/api/ready", "/api/metrics", "/api/events", "/api/admin/links/scan"}
+
+class Overloaded(Exception):
+    """No slot became free in time"""
+
+class Gate:
+    """Concurrency limit with a bounded FIFO wait queue and a deadline"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float = QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_queued = 0
+        self.wait_total = 0.0
+
+    async def acquire(self):
+        """Take a slot, waiting in line if needed; raises Overloaded"""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded(self.name)
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.waiters.append(waiter)
+        self.peak_queued = max(self.peak_queued, len(self.waiters))
+        started = loop.time()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(self.name)
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self.waiters.remove(waiter)
+                except ValueError:
+                    pass
+        self.admitted += 1
+        self.wait_total += loop.time() - started
+
+    def release(self):
+        """Hand the slot to the next waiter, or free it"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.wait_total * 1000 / self.admitted, 2) if self.admitted else 0.0,
+        }
+
+# Process-wide: threads and file handles are per process, not per portal
+reads = Gate("reads", MAX_READS, READ_QUEUE)
+writes = Gate("writes", MAX_WRITES, WRITE_QUEUE)
+
+def gate_for(scope) -> Optional[Gate]:
+    """The gate a request must pass, or None when it is not limited"""
+    path = tenancy.route_path(scope)
+    if not path.startswith("/api/") or path in EXEMPT_PATHS or path.endswith("/hit"):
+        return None
+    gate = reads if scope["method"] in READ_METHODS else writes
+    return gate if gate.limit > 0 else None
+
+def stats() -> dict:
+    return {"reads": reads.stats(), "writes": writes.stats()}
+
+class AdmissionMiddleware:
+    """ASGI middleware holding a slot for the whole request, body included"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        gate = gate_for(scope) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await gate.acquire()
+        except Overloaded:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(RETRY_AFTER).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server busy, retry shortly"}'})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
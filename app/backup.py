@@ -0,0 +1,180 @@
+"""
+Online Backup and Restore for Tool Table
+Copies the live database with SQLite's backup API while the server keeps serving
+
+Usage: python -m app.backup [--list] [--restore NAME] [--keep N]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from . import database, tenancy
+from .changes import OP_RESET, notify
+from .coherence import watcher
+from .writer import writer
+
+# Snapshot directory (override with TOOL_TABLE_BACKUP_DIR); other portals
+# than the default keep theirs under tenants/<name> in it
+BACKUP_DIR = Path(os.environ.get("TOOL_TABLE_BACKUP_DIR", database.DB_DIR / "backups"))
+
+# Snapshots kept; older ones are deleted after each backup
+BACKUP_KEEP = int(os.environ.get("TOOL_TABLE_BACKUP_KEEP", "7"))
+
+# Pages copied per backup step; writers get the lock back between steps
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+BACKUP_PREFIX = "tool-table-"
+
+# One backup or restore at a time per database
+_lock = tenancy.tenant_local(asyncio.Lock)
+
+def backup_root() -> Path:
+    """Snapshot directory of the portal being served"""
+    return tenancy.current().subdir(BACKUP_DIR)
+
+def list_backups(backup_dir: Optional[Path] = None) -> List[dict]:
+    """Get snapshots, newest first"""
+    backup_dir = backup_dir or backup_root()
+    backups = []
+    if backup_dir.exists():
+        for f in backup_dir.glob(f"{BACKUP_PREFIX}*.db"):
+            stat = f.stat()
+            backups.append({"name": f.name, "size": stat.st_size, "created": stat.st_mtime})
+    return sorted(backups, key=lambda b: (b["created"], b["name"]), reverse=True)
+
+def resolve_backup(name: str, backup_dir: Optional[Path] = None) -> Path:
+    """Map a snapshot name to its file; only listed snapshots are accepted"""
+    backup_dir = backup_dir or backup_root()
+    if name not in {b["name"] for b in list_backups(backup_dir)}:
+        raise FileNotFoundError(name)
+    return backup_dir / name
+
+def _version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+def backup_file(backup_dir: Optional[Path] = None, keep: int = BACKUP_KEEP) -> dict:
+    """Copy the live database into a new snapshot, then rotate (blocking)"""
+    backup_dir = backup_dir or backup_root()
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+    name = f"{BACKUP_PREFIX}{stamp}.db"
+    n = 1
+    while (backup_dir / name).exists():
+        name = f"{BACKUP_PREFIX}{stamp}-{n}.db"
+        n += 1
+    target = backup_dir / name
+    tmp = backup_dir / f".{name}.tmp"
+
+    src = sqlite3.connect(database.db_path())
+    try:
+        dst = sqlite3.connect(tmp)
+        try:
+            # Copies in steps; commits during the copy restart it from the
+            # changed pages, so the snapshot is always one consistent state
+            src.backup(dst, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP)
+            version = _version(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    os.replace(tmp, target)
+
+    removed = 0
+    for old in list_backups(backup_dir)[keep:]:
+        (backup_dir / old["name"]).unlink(missing_ok=True)
+        removed += 1
+    return {"name": name, "version": version, "size": target.stat().st_size, "removed": removed}
+
+def restore_file(path: Path) -> int:
+    """Replace the live database contents with a snapshot (blocking)
+
+    The snapshot is checked and prepared in memory, then written into the
+    live file in a single backup step, which is one transaction: connections
+    in every worker stay valid and see either the old or the restored data.
+    Snapshots from an older schema are migrated while staged; ones from a
+    newer schema are refused. The change log is emptied and the data version
+    moved past both the live and the snapshot's, so every client and worker
+    cache sees a reset rather than a version going backwards. Returns the
+    new data version.
+    """
+    snapshot = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = snapshot.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"Snapshot {path.name} failed integrity check: {result}")
+        staged = sqlite3.connect(":memory:")
+        snapshot.backup(staged)
+    finally:
+        snapshot.close()
+
+    try:
+        database.migrate(staged)
+    except Exception:
+        staged.close()
+        raise
+
+    live = sqlite3.connect(database.db_path(), isolation_level=None)
+    try:
+        version = max(_version(live), _version(staged)) + 1
+        staged.execute("DELETE FROM change_log")
+        staged.execute("DELETE FROM sqlite_sequence WHERE name = 'change_log'")
+        staged.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)", (version,))
+        staged.commit()
+        staged.backup(live)
+    finally:
+        staged.close()
+        live.close()
+    return version
+
+async def backup() -> dict:
+    """Take a snapshot without blocking the event loop"""
+    async with _lock:
+        return await asyncio.to_thread(backup_file)
+
+async def restore(name: str) -> int:
+    """Restore a snapshot and reset everything derived from the old data"""
+    path = resolve_backup(name)
+    async with _lock:
+        # Reopen the long-lived connections around the swap; writes that
+        # arrive meanwhile run on their own connection after it
+        restart_writer = writer.running
+        restart_watcher = watcher.task is not None
+        await watcher.stop()
+        await writer.stop()
+        try:
+            version = await asyncio.to_thread(restore_file, path)
+        finally:
+            if restart_writer:
+                await writer.start()
+            if restart_watcher:
+                await watcher.start()
+    notify([{"version": version, "entity": None, "id": None, "op": OP_RESET}])
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.backup",
+                                     description="Back up or restore the database while it is in use")
+    parser.add_argument("--list", action="store_true", help="list snapshots")
+    parser.add_argument("--restore", metavar="NAME", help="restore a snapshot by name")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help=f"snapshots to keep (default: {BACKUP_KEEP})")
+    args = parser.parse_args()
+
+    if args.list:
+        for b in list_backups():
+            print(f"{b['name']}  {b['size'] / 1024:.0f} KiB")
+    elif args.restore:
+        version = restore_file(resolve_backup(args.restore))
+        print(f"  ✓ Restored {args.restore} (data version {version})")
+    else:
+        result = backup_file(keep=args.keep)
+        print(f"  ✓ Backup {result['name']} (data version {result['version']}, "
+              f"{result['size'] / 1024:.0f} KiB, {result['removed']} old snapshot(s) removed)")
+
+if __name__ == "__main__":
+    main()
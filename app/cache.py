@@ -0,0 +1,78 @@
+"""
+Result Cache for Tool Table
+Bounded LRU cache with a TTL and approximate memory accounting
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from . import metrics
+
+def estimate_size(value: Any) -> int:
+    """Approximate size in bytes: bytes as-is, other values by their JSON encoding"""
+    if isinstance(value, bytes):
+        return len(value)
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode())
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count and total size
+
+    Keys should carry the data version they were computed at, so entries
+    from before a commit can never be served after it; `clear()` on commit
+    only releases their memory early. The TTL bounds how long a result lives
+    even if the version somehow doesn't move.
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        metrics.register(f"cache.{name}", self.stats)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: Hashable, value: Any):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
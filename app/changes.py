@@ -0,0 +1,218 @@
+"""
+Change Log Module for Tool Table
+Append-only change feed written in the same transaction as each mutation
+"""
+import os
+import weakref
+from typing import Callable, Iterable, List, Optional, Set
+
+from .tenancy import tenant_local
+from .serialize import (
+    NODE_COLUMNS, AUTH_LINK_COLUMNS, NodeRow, AuthLinkRow, fetch_rows
+)
+
+# Entities tracked by the change log
+ENTITY_NODE = "node"
+ENTITY_AUTH_LINK = "auth_link"
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+OP_RESET = "reset"  # Drop all derived state; emitted for gaps, never stored
+
+# Number of most recent versions kept in the change log; clients further
+# behind than this are told to reload their full copy
+CHANGE_LOG_RETENTION = int(os.environ.get("TOOL_TABLE_CHANGE_RETENTION", "5000"))
+
+# Retention pruning runs once every N recorded versions
+PRUNE_INTERVAL = 100
+
+# Changes recorded on a connection but not yet committed
+_pending = weakref.WeakKeyDictionary()
+
+class Feed:
+    """Commit notifications of one tenant's database"""
+
+    def __init__(self):
+        # Callbacks invoked with the list of changes after each commit, local
+        # or detected from another process by the coherence watcher
+        self.listeners: List[Callable[[List[dict]], None]] = []
+        # Highest data version this process has seen committed
+        self.version = 0
+        # Versions committed (or being committed) by this process that the
+        # coherence watcher must not replay; it forgets them once passed
+        self.local_versions: Set[int] = set()
+
+_feed = tenant_local(Feed)
+
+def seen_version() -> int:
+    """Get the highest data version this process has seen committed"""
+    return _feed.version
+
+def set_seen_version(version: int):
+    """Set the known data version (startup, or after a reset)"""
+    _feed.version = version
+
+def notify(changes: List[dict]):
+    """Advance the known version and pass committed changes to listeners"""
+    _feed.version = max(_feed.version, changes[-1]["version"])
+    for callback in list(_feed.listeners):
+        callback(changes)
+
+def add_listener(callback: Callable[[List[dict]], None]):
+    """Register a callback for committed changes"""
+    if callback not in _feed.listeners:
+        _feed.listeners.append(callback)
+
+def remove_listener(callback: Callable[[List[dict]], None]):
+    """Unregister a committed-changes callback"""
+    if callback in _feed.listeners:
+        _feed.listeners.remove(callback)
+
+def local_versions() -> Set[int]:
+    """Versions this process committed that the watcher hasn't passed yet"""
+    return _feed.local_versions
+
+def forget_local_versions(upto: int):
+    """Drop local versions at or below `upto` (seen by the watcher)"""
+    _feed.local_versions = {v for v in _feed.local_versions if v > upto}
+
+async def commit(db):
+    """Commit the connection and notify listeners of its recorded changes"""
+    changes = _pending.pop(db, None) or []
+    # Marked local before the commit so a watcher poll right after it
+    # can't mistake them for another process's changes
+    versions = {c["version"] for c in changes}
+    _feed.local_versions |= versions
+    try:
+        await db.commit()
+    except Exception:
+        _feed.local_versions -= versions
+        raise
+    if changes:
+        notify(changes)
+
+async def rollback(db):
+    """Roll back the connection and discard its recorded changes"""
+    await db.rollback()
+    _pending.pop(db, None)
+
+def pending_mark(db) -> int:
+    """Get a marker for the changes recorded so far on a connection"""
+    return len(_pending.get(db, ()))
+
+def discard_pending(db, mark: int = 0):
+    """Forget changes recorded after `mark` (rolled back to a savepoint)"""
+    if db in _pending:
+        del _pending[db][mark:]
+
+async def get_version(db) -> int:
+    """Get the current data version (last committed change)"""
+    cursor = await db.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+    )
+    row = await cursor.fetchone()
+    return row[0] if row else 0
+
+async def fetch_log(db, since: int) -> List[dict]:
+    """Get raw change log entries after `since`, oldest first
+
+    A single reset entry is returned when entries were pruned away.
+    """
+    cursor = await db.execute(
+        """SELECT version, entity, entity_id AS id, op FROM change_log
+           WHERE version > ? ORDER BY version""",
+        (since,)
+    )
+    rows = [dict(row) for row in await cursor.fetchall()]
+    if not rows or rows[0]['version'] != since + 1:
+        version = await get_version(db)
+        if version > since:
+            return [{"version": version, "entity": None, "id": None, "op": OP_RESET}]
+    return rows
+
+async def record_change(db, entity: str, entity_id: int, op: str) -> int:
+    """Append one change to the log and return its version
+
+    Must be called on the same connection, before the commit, as the
+    mutation it describes. Listeners are notified by `commit`.
+    """
+    cursor = await db.execute(
+        "INSERT INTO change_log (entity, entity_id, op) VALUES (?, ?, ?)",
+        (entity, entity_id, op)
+    )
+    version = cursor.lastrowid
+    _pending.setdefault(db, []).append(
+        {"version": version, "entity": entity, "id": entity_id, "op": op}
+    )
+    if version % PRUNE_INTERVAL == 0:
+        await prune_changes(db, version)
+    return version
+
+async def record_changes(db, entity: str, entity_ids: Iterable[int], op: str) -> int:
+    """Append one change per id and return the last version"""
+    version = 0
+    for entity_id in entity_ids:
+        version = await record_change(db, entity, entity_id, op)
+    return version
+
+async def prune_changes(db, version: Optional[int] = None):
+    """Drop change log entries older than the retention window"""
+    if version is None:
+        version = await get_version(db)
+    await db.execute(
+        "DELETE FROM change_log WHERE version <= ?",
+        (version - CHANGE_LOG_RETENTION,)
+    )
+
+async def fetch_changes(db, since: int) -> dict:
+    """Collect changes after `since`, compacted to the latest op per row"""
+    version = await get_version(db)
+    feed = {
+        "version": version,
+        "reset": False,
+        "nodes": [],
+        "auth_links": [],
+        "deleted_nodes": [],
+        "deleted_auth_links": [],
+    }
+    if since == version:
+        return feed
+
+    cursor = await db.execute("SELECT MIN(version) AS oldest FROM change_log")
+    oldest = (await cursor.fetchone())['oldest']
+    if since > version or oldest is None or oldest > since + 1:
+        # Client is ahead of us or behind the retention window
+        feed["reset"] = True
+        return feed
+
+    # SQLite returns the bare columns of the row holding MAX(version)
+    cursor = await db.execute(
+        """SELECT entity, entity_id, op, MAX(version) AS version
+           FROM change_log WHERE version > ? AND version <= ?
+           GROUP BY entity, entity_id""",
+        (since, version)
+    )
+    upserts = {ENTITY_NODE: [], ENTITY_AUTH_LINK: []}
+    deletes = {ENTITY_NODE: [], ENTITY_AUTH_LINK: []}
+    for row in await cursor.fetchall():
+        target = upserts if row['op'] == OP_UPSERT else deletes
+        target[row['entity']].append(row['entity_id'])
+
+    for entity, table, key, row_type, columns in (
+        (ENTITY_NODE, "nodes", "nodes", NodeRow, NODE_COLUMNS),
+        (ENTITY_AUTH_LINK, "auth_links", "auth_links", AuthLinkRow, AUTH_LINK_COLUMNS),
+    ):
+        ids = upserts[entity]
+        found = set()
+        if ids:
+            placeholders = ", ".join("?" * len(ids))
+            for row in await fetch_rows(
+                db, row_type, f"SELECT {columns} FROM {table} WHERE id IN ({placeholders})", ids
+            ):
+                found.add(row.id)
+                feed[key].append(row.as_dict())
+        # Rows upserted and then removed outside the log count as deleted
+        missing = [i for i in ids if i not in found]
+        feed[f"deleted_{key}"] = sorted(deletes[entity] + missing)
+
+    return feed
@@ -0,0 +1,95 @@
+"""
+Cross-Process Coherence for Tool Table
+Detects commits made by other workers and replays them to local listeners
+"""
+import asyncio
+import os
+from typing import Optional
+
+import aiosqlite
+
+from . import database
+from .changes import (
+    OP_RESET, fetch_log, forget_local_versions, get_version, local_versions, notify,
+    seen_version, set_seen_version
+)
+from .tenancy import tenant_local
+
+# Seconds between PRAGMA data_version checks
+POLL_INTERVAL = float(os.environ.get("TOOL_TABLE_COHERENCE_INTERVAL", "0.5"))
+
+class VersionWatcher:
+    """Poll SQLite's data_version on a dedicated connection
+
+    `PRAGMA data_version` changes whenever another connection (in this or
+    any other process) commits to the database file, and reading it does
+    not touch the tables. Only when it moves does the watcher read the
+    change log past its cursor, skipping versions committed in-process
+    (listeners already had those).
+    """
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self.db: Optional[aiosqlite.Connection] = None
+        self.task: Optional[asyncio.Task] = None
+        self.data_version: Optional[int] = None
+        self.cursor = 0
+        self.remote_changes = 0
+
+    async def start(self):
+        """Open the watcher connection and start polling"""
+        self.db = await database.get_db()
+        self.data_version = await self._read_data_version()
+        self.cursor = await get_version(self.db)
+        set_seen_version(max(seen_version(), self.cursor))
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling and close the watcher connection"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.db:
+            await self.db.close()
+            self.db = None
+
+    async def _read_data_version(self) -> int:
+        cursor = await self.db.execute("PRAGMA data_version")
+        return (await cursor.fetchone())[0]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"Coherence check failed: {e}")
+
+    async def check(self) -> int:
+        """Replay changes committed elsewhere; return how many were found"""
+        data_version = await self._read_data_version()
+        if data_version == self.data_version:
+            return 0
+        self.data_version = data_version
+
+        changes = await fetch_log(self.db, self.cursor)
+        if not changes:
+            return 0
+        self.cursor = changes[-1]["version"]
+        local = local_versions()
+        remote = [
+            c for c in changes
+            if c["op"] == OP_RESET or c["version"] not in local
+        ]
+        forget_local_versions(self.cursor)
+        if remote:
+            self.remote_changes += len(remote)
+            notify(remote)
+        return len(remote)
+
+# One watcher per tenant database
+watcher = tenant_local(VersionWatcher)
@@ -4,66 +4,162 @@ Handles database connection and table creation
 """
 import aiosqlite
 import os
+import sqlite3
 from pathlib import Path
 
-# Database path
-DB_DIR = Path(__file__).parent.parent / "data"
-DB_PATH = DB_DIR / "tool-table.db"
+from . import tenancy
+
+# Database path of the default portal (override with TOOL_TABLE_DB)
+DB_PATH = Path(os.environ.get(
+    "TOOL_TABLE_DB", Path(__file__).parent.parent / "data" / "tool-table.db"
+))
+DB_DIR = DB_PATH.parent
+
+def db_path() -> Path:
+    """Database path of the portal being served (see app.tenancy)"""
+    return tenancy.current().db_path
 
 def ensure_db_dir():
     """Ensure data directory exists"""
-    DB_DIR.mkdir(parents=True, exist_ok=True)
+    db_path().parent.mkdir(parents=True, exist_ok=True)
 
 async def get_db():
     """Get database connection"""
     ensure_db_dir()
-    db = await aiosqlite.connect(DB_PATH)
+    db = await aiosqlite.connect(db_path())
     db.row_factory = aiosqlite.Row
+    # Off by default in SQLite; needed for parent_id checks and cascades
+    await db.execute("PRAGMA foreign_keys = ON")
     return db
 
-async def init_db():
-    """Initialize database tables"""
-    ensure_db_dir()
-    async with aiosqlite.connect(DB_PATH) as db:
+# Ordered schema migrations: (version, statements). Append new versions
+# here instead of editing old ones; `init_db` applies those a database
+# hasn't seen yet and records them in schema_version. Statements use
+# IF NOT EXISTS so databases created before versioning adopt them safely.
+MIGRATIONS = [
+    (1, [
         # Nodes table - unified hierarchy
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS nodes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                parent_id INTEGER,
-                code TEXT UNIQUE,
-                name TEXT NOT NULL,
-                node_type TEXT NOT NULL CHECK(node_type IN ('folder', 'link')),
-                icon TEXT,
-                url TEXT,
-                sort_order INTEGER DEFAULT 0,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (parent_id) REFERENCES nodes(id) ON DELETE CASCADE
-            )
-        """)
-        
+        """CREATE TABLE IF NOT EXISTS nodes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            parent_id INTEGER,
+            code TEXT UNIQUE,
+            name TEXT NOT NULL,
+            node_type TEXT NOT NULL CHECK(node_type IN ('folder', 'link')),
+            icon TEXT,
+            url TEXT,
+            sort_order INTEGER DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_id) REFERENCES nodes(id) ON DELETE CASCADE
+        )""",
         # Auth links table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS auth_links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                region TEXT NOT NULL,
-                name TEXT NOT NULL,
-                url TEXT NOT NULL,
-                sort_order INTEGER DEFAULT 0,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        """CREATE TABLE IF NOT EXISTS auth_links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            region TEXT NOT NULL,
+            name TEXT NOT NULL,
+            url TEXT NOT NULL,
+            sort_order INTEGER DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_nodes_parent ON nodes(parent_id)",
+        "CREATE INDEX IF NOT EXISTS idx_nodes_code ON nodes(code)",
+        "CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(node_type)",
+        "CREATE INDEX IF NOT EXISTS idx_auth_region ON auth_links(region)",
+    ]),
+    (2, [
+        # Change log - append-only feed of mutations for delta sync
+        """CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL CHECK(entity IN ('node', 'auth_link')),
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (3, [
+        # Link clicks per node and UTC day, flushed in batches by app.hits
+        """CREATE TABLE IF NOT EXISTS node_hits (
+            node_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (node_id, day),
+            FOREIGN KEY (node_id) REFERENCES nodes(id) ON DELETE CASCADE
+        ) WITHOUT ROWID""",
+    ]),
+    (4, [
+        # Last link-health probe per node / auth link URL, written by app.linkcheck
+        """CREATE TABLE IF NOT EXISTS link_status (
+            entity TEXT NOT NULL CHECK(entity IN ('node', 'auth_link')),
+            entity_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            error TEXT,
+            latency_ms INTEGER,
+            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (entity, entity_id)
+        ) WITHOUT ROWID""",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+SCHEMA_VERSION_TABLE = """CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)"""
+
+async def schema_version(db) -> int:
+    """Latest migration applied to the database (0 before versioning)"""
+    try:
+        cursor = await db.execute("SELECT MAX(version) FROM schema_version")
+    except aiosqlite.OperationalError:
+        return 0
+    return (await cursor.fetchone())[0] or 0
+
+async def init_db():
+    """Bring the database schema up to date; a no-op read when it already is"""
+    ensure_db_dir()
+    async with aiosqlite.connect(db_path()) as db:
+        if await schema_version(db) == SCHEMA_VERSION:
+            return
+
+        # Only takes effect before the first table is created; existing
+        # databases are converted by `python -m app.maintenance`
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
         
-        # Create indexes
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_nodes_parent ON nodes(parent_id)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_nodes_code ON nodes(code)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(node_type)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_auth_region ON auth_links(region)")
+        # WAL lets readers proceed while the single writer commits
+        # (persistent, so only needed once per database file)
+        await db.execute("PRAGMA journal_mode = WAL")
         
+        # Workers starting together migrate one at a time
+        await db.execute("BEGIN IMMEDIATE")
+        await db.execute(SCHEMA_VERSION_TABLE)
+        current = await schema_version(db)
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                await db.execute(statement)
+            await db.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
         await db.commit()
-        print(f"Database initialized at {DB_PATH}")
+        print(f"Database initialized at {db_path()} (schema v{SCHEMA_VERSION})")
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations on a blocking connection (e.g. a staged
+    restore); raises ValueError for a schema newer than this code. Returns
+    the number applied; the caller commits."""
+    conn.execute(SCHEMA_VERSION_TABLE)
+    current = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    if current > SCHEMA_VERSION:
+        raise ValueError(f"Schema v{current} is newer than this server supports (v{SCHEMA_VERSION})")
+    pending = [(version, statements) for version, statements in MIGRATIONS if version > current]
+    for version, statements in pending:
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+    return len(pending)
 
 async def close_db(db):
     """Close database connection"""
@@ -0,0 +1,102 @@
+"""
+Live Event Broadcasting for Tool Table
+Fans committed changes out to Server-Sent Events subscribers
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, List, Optional, Set
+
+from .tenancy import tenant_local
+
+# Commits buffered per subscriber before it is considered too slow and dropped
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("TOOL_TABLE_SSE_QUEUE_SIZE", "256"))
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+
+class Subscriber:
+    """One connected event stream with its own bounded queue"""
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+class Broadcaster:
+    """Broadcast compact change notifications to all subscribers"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscriber] = set()
+        self.version = 0
+        self.dropped_total = 0
+
+    def subscribe(self) -> Subscriber:
+        """Register a new subscriber"""
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a subscriber"""
+        self.subscribers.discard(subscriber)
+
+    def publish(self, changes: List[dict]):
+        """Queue changes for every subscriber, dropping any that fall behind"""
+        self.version = max(self.version, changes[-1]["version"])
+
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(changes)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        """Disconnect a slow consumer; it resyncs from /api/changes on reconnect"""
+        self.dropped_total += 1
+        subscriber.dropped = True
+        self._close(subscriber)
+
+    def _close(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        # Make room for the wake-up sentinel
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def close_all(self):
+        """End every open stream (used when the worker starts draining)"""
+        for subscriber in list(self.subscribers):
+            self._close(subscriber)
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[str]:
+        """Yield SSE frames for a subscriber until it disconnects or is dropped"""
+        try:
+            yield format_event("hello", {"version": self.version})
+            while True:
+                try:
+                    batch = await asyncio.wait_for(
+                        subscriber.queue.get(), KEEPALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if batch is None:
+                    break
+                yield "".join(
+                    format_event("change", change, change["version"])
+                    for change in batch
+                )
+        finally:
+            self.unsubscribe(subscriber)
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events frame"""
+    frame = f"event: {event}\n"
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    return frame + f"data: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+# One broadcaster per tenant
+broadcaster = tenant_local(Broadcaster)
@@ -0,0 +1,242 @@
+"""
+Fuzzy Search Index for Tool Table
+In-memory bigram index over node names and codes with bounded edit distance
+"""
+import asyncio
+import heapq
+import unicodedata
+from collections import Counter
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import database
+from .changes import ENTITY_NODE, OP_RESET
+from .serialize import NODE_COLUMNS, fetch_nodes
+from .tenancy import tenant_local
+
+# Candidates verified with edit distance, per requested result
+CANDIDATES_PER_RESULT = 20
+
+def normalize(text: str) -> str:
+    """Fold full-width forms, compatibility characters and case"""
+    return "".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+def grams(text: str) -> Set[str]:
+    """Character bigrams (single characters for one-character text)"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def max_distance(query: str) -> int:
+    """Typos tolerated for a query: none up to 2 characters, then 1 per 4"""
+    return 0 if len(query) <= 2 else max(1, len(query) // 4)
+
+def substring_distance(query: str, text: str, bound: int) -> Optional[int]:
+    """Edit distance from `query` to its closest substring of `text`
+
+    Myers' bit-parallel algorithm: one pass over `text` with a bit per query
+    character, matching may start and end anywhere. Returns None when the
+    distance exceeds `bound`.
+    """
+    if query in text:
+        return 0
+    if bound == 0:
+        return None
+    length = len(query)
+    mask = (1 << length) - 1
+    high = 1 << (length - 1)
+    peq: Dict[str, int] = {}
+    for i, ch in enumerate(query):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    pv, mv, score = mask, 0, length
+    best = length
+    for ch in text:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+            if score < best:
+                best = score
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return best if best <= bound else None
+
+class FuzzyIndex:
+    """Bigram postings over active nodes, kept current from the change feed
+
+    Writes only mark node ids as stale; they are re-read from the database
+    by the next fuzzy search, so commits never wait on the index.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.keys: Dict[int, Tuple[str, str]] = {}  # id -> (name, code), normalized
+        self.parents: Dict[int, Tuple[Optional[int], str]] = {}  # id -> (parent_id, name)
+        self.built = False
+        self.stale: Set[int] = set()
+        self.lock = asyncio.Lock()
+
+    def on_commit(self, changes: List[dict]):
+        """Listener: mark changed nodes for re-indexing"""
+        for change in changes:
+            if change['op'] == OP_RESET:
+                self.built = False
+            elif change['entity'] == ENTITY_NODE:
+                self.stale.add(change['id'])
+
+    def _add(self, row):
+        node_id = row['id']
+        self.parents[node_id] = (row['parent_id'], row['name'])
+        if not row['is_active']:
+            return
+        key = (normalize(row['name']), normalize(row['code']))
+        self.keys[node_id] = key
+        for gram in grams(key[0]) | grams(key[1]):
+            self.postings.setdefault(gram, set()).add(node_id)
+
+    def _remove(self, node_id: int):
+        self.parents.pop(node_id, None)
+        key = self.keys.pop(node_id, None)
+        if key is None:
+            return
+        for gram in grams(key[0]) | grams(key[1]):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(node_id)
+                if not posting:
+                    del self.postings[gram]
+
+    async def refresh(self, db):
+        """Build the index, or re-read nodes changed since the last search"""
+        async with self.lock:
+            if not self.built:
+                self.stale.clear()
+                cursor = await db.execute(
+                    "SELECT id, parent_id, name, code, is_active FROM nodes"
+                )
+                self.postings.clear()
+                self.keys.clear()
+                self.parents.clear()
+                for row in await cursor.fetchall():
+                    self._add(row)
+                self.built = True
+            elif self.stale:
+                ids = list(self.stale)
+                self.stale.clear()
+                for node_id in ids:
+                    self._remove(node_id)
+                placeholders = ",".join("?" * len(ids))
+                cursor = await db.execute(
+                    f"SELECT id, parent_id, name, code, is_active FROM nodes WHERE id IN ({placeholders})",
+                    ids,
+                )
+                for row in await cursor.fetchall():
+                    self._add(row)
+
+    def path(self, node_id: int) -> str:
+        """Full path of a node from the in-memory parent map"""
+        parts = []
+        seen = set()
+        while node_id in self.parents and node_id not in seen:
+            seen.add(node_id)
+            parent_id, name = self.parents[node_id]
+            parts.append(name)
+            node_id = parent_id
+        return " > ".join(reversed(parts))
+
+    def _candidates(self, query: str, bound: int, cap: int) -> List[int]:
+        """Get up to `cap` node ids that may lie within `bound` edits of `query`"""
+        if len(query) == 1:
+            # Single characters aren't indexed; take every bigram containing it
+            found = set().union(*(ids for gram, ids in self.postings.items() if query in gram))
+            return list(islice(found, cap))
+
+        postings = sorted(
+            (self.postings.get(gram, set()) for gram in grams(query)), key=len
+        )
+        # Nodes sharing every bigram (set intersection runs in C) usually
+        # contain the query outright; when they are plenty, skip counting
+        full = set.intersection(*postings)
+        if len(full) >= cap:
+            return list(islice(full, cap))
+
+        # Each edit breaks at most two bigrams, so a match shares at least
+        # `required` of them, and therefore one of the rarest (n - required + 1)
+        required = max(1, len(postings) - 2 * bound)
+        prefix = len(postings) - required + 1
+        counts = Counter()
+        for ids in postings[:prefix]:
+            counts.update(ids)
+        if required > 1:
+            for ids in postings[prefix:]:
+                counts.update(ids.intersection(counts))
+
+        # Verify only the best-overlapping candidates: raise the threshold
+        # while enough nodes share that many bigrams with the query
+        histogram = Counter(counts.values())
+        threshold = required
+        at_least = 0
+        for count in sorted(histogram, reverse=True):
+            at_least += histogram[count]
+            if at_least >= cap:
+                threshold = max(threshold, count)
+                break
+        return [node_id for node_id, count in counts.items() if count >= threshold][:cap]
+
+    def search(self, q: str, limit: int) -> List[Tuple[int, int]]:
+        """Get up to `limit` (node id, distance) pairs, best first"""
+        query = normalize(q)
+        if not query:
+            return []
+        bound = max_distance(query)
+        candidates = self._candidates(query, bound, limit * CANDIDATES_PER_RESULT)
+
+        scored = []
+        for node_id in candidates:
+            name, code = self.keys[node_id]
+            distance = substring_distance(query, name, bound)
+            if distance != 0:
+                code_distance = substring_distance(query, code, bound)
+                if code_distance is not None and (distance is None or code_distance < distance):
+                    distance = code_distance
+            if distance is not None:
+                exact = query == name or query == code
+                scored.append((distance, not exact, len(name), name, node_id))
+        return [(item[-1], item[0]) for item in heapq.nsmallest(limit, scored)]
+
+# One index per tenant
+index = tenant_local(FuzzyIndex)
+
+async def search(q: str, limit: int) -> List[dict]:
+    """Fuzzy search active nodes; rows carry `path` and edit `distance`"""
+    db = await database.get_db()
+    try:
+        await index.refresh(db)
+        matches = index.search(q, limit)
+        if not matches:
+            return []
+        ids = [node_id for node_id, _ in matches]
+        rows = {
+            row.id: row.as_dict() for row in await fetch_nodes(
+                db, f"SELECT {NODE_COLUMNS} FROM nodes WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+        }
+    finally:
+        await db.close()
+
+    results = []
+    for node_id, distance in matches:
+        node = rows.get(node_id)
+        if node is None:
+            continue
+        node['path'] = index.path(node_id)
+        node['distance'] = distance
+        results.append(node)
+    return results
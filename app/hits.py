@@ -0,0 +1,125 @@
+"""
+Hit Counters for Tool Table
+Counts link clicks in memory and flushes them to per-day totals in batches
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import metrics
+from .tenancy import tenant_local
+from .writer import writer
+
+# Seconds between flushes of buffered hits
+FLUSH_INTERVAL = float(os.environ.get("TOOL_TABLE_HIT_FLUSH_INTERVAL", "10"))
+
+# Distinct (node, day) counters buffered before an early flush
+MAX_PENDING = 10000
+
+# Days of hits counted towards popularity
+POPULARITY_DAYS = int(os.environ.get("TOOL_TABLE_POPULARITY_DAYS", "30"))
+
+# Per-node hit totals over the popularity window, for LEFT JOIN ... ON h.node_id = n.id
+POPULARITY_SQL = f"""(SELECT node_id, SUM(hits) AS hits FROM node_hits
+        WHERE day >= date('now', '-{POPULARITY_DAYS} days') GROUP BY node_id)"""
+
+class HitCounter:
+    """Buffer hits and add them to node_hits through the writer
+
+    Recording a hit is a dict update; no request ever waits on the database.
+    Hits for nodes deleted before the flush are dropped. Hit totals are not
+    data changes and do not advance the data version.
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending: Dict[Tuple[int, str], int] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.flushing: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushed = 0
+        metrics.register("hits", self.stats)
+
+    def record(self, node_id: int):
+        # UTC, like SQLite's date('now')
+        key = (node_id, datetime.now(timezone.utc).date().isoformat())
+        self.pending[key] = self.pending.get(key, 0) + 1
+        self.recorded += 1
+        if len(self.pending) >= self.max_pending and (self.flushing is None or self.flushing.done()):
+            self.flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Write buffered hits in one job; return how many were written"""
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+
+        async def apply(db):
+            await db.executemany(
+                """INSERT INTO node_hits (node_id, day, hits)
+                   SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM nodes WHERE id = ?)
+                   ON CONFLICT(node_id, day) DO UPDATE SET hits = hits + excluded.hits""",
+                [(node_id, day, hits, node_id) for (node_id, day), hits in batch.items()]
+            )
+
+        try:
+            await writer.submit(apply)
+        except Exception:
+            # Put the batch back so the next flush retries it
+            for key, hits in batch.items():
+                self.pending[key] = self.pending.get(key, 0) + hits
+            raise
+        total = sum(batch.values())
+        self.flushed += total
+        return total
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write what is still buffered"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Hit flush failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Hit flush failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "pending": sum(self.pending.values()),
+        }
+
+# One counter per tenant
+counter = tenant_local(HitCounter)
+
+async def fetch_popularity(db, ids: Iterable[int]) -> Dict[int, int]:
+    """Get hit totals over the popularity window for the given nodes"""
+    ids = list(ids)
+    if not ids:
+        return {}
+    cursor = await db.execute(
+        f"""SELECT node_id, SUM(hits) AS hits FROM node_hits
+            WHERE day >= date('now', '-{POPULARITY_DAYS} days')
+              AND node_id IN ({','.join('?' * len(ids))})
+            GROUP BY node_id""",
+        ids
+    )
+    return {row['node_id']: row['hits'] for row in await cursor.fetchall()}
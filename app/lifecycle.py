@@ -0,0 +1,82 @@
+"""
+Process Lifecycle for Tool Table
+Warm-up hooks, readiness state and graceful drain on shutdown
+"""
+import asyncio
+import signal
+from typing import Awaitable, Callable, List
+
+# Coroutines run once per worker before it reports ready
+_warmups: List[Callable[[], Awaitable[None]]] = []
+
+# Callbacks run on the event loop when the worker starts draining
+_drain_callbacks: List[Callable[[], None]] = []
+
+class State:
+    """Readiness of this worker (distinct from liveness at /api/health)"""
+    ready = False
+    draining = False
+
+state = State()
+
+def add_warmup(fn: Callable[[], Awaitable[None]]):
+    """Register a coroutine function that warms derived data at startup"""
+    if fn not in _warmups:
+        _warmups.append(fn)
+
+def on_drain(callback: Callable[[], None]):
+    """Register a callback run when shutdown begins"""
+    if callback not in _drain_callbacks:
+        _drain_callbacks.append(callback)
+
+async def run_warmups():
+    """Run all warm-up hooks for the current tenant"""
+    for fn in _warmups:
+        try:
+            await fn()
+        except Exception as e:
+            print(f"Warm-up {fn.__name__} failed: {e}")
+
+async def warm_up():
+    """Run all warm-up hooks, then mark the worker ready"""
+    await run_warmups()
+    state.ready = True
+    state.draining = False
+
+def remove_drain(callback: Callable[[], None]):
+    """Unregister a drain callback (its owner closed early)"""
+    if callback in _drain_callbacks:
+        _drain_callbacks.remove(callback)
+
+def begin_drain():
+    """Stop reporting ready and release long-lived connections"""
+    if state.draining:
+        return
+    state.ready = False
+    state.draining = True
+    for callback in list(_drain_callbacks):
+        callback()
+
+def install_drain_signals():
+    """Chain SIGINT/SIGTERM so draining starts as soon as shutdown does
+
+    The server's own handlers still run afterwards; they stop accepting
+    connections and wait for in-flight requests, which finish sooner once
+    open event streams have been told to close.
+    """
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            # Nothing to chain to; leave default behaviour alone
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(begin_drain)
+            previous(signum, frame)
+
+        try:
+            signal.signal(sig, handler)
+        except (ValueError, OSError):
+            # Not on the main thread (e.g. under a test client)
+            pass
@@ -0,0 +1,284 @@
+"""
+Link Health Scanner for Tool Table
+Probes every node and auth link URL concurrently and records the result
+
+Usage: python -m app.linkcheck [--timeout SECONDS] [--per-host N] [--dead]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from . import database, metrics
+from .changes import ENTITY_NODE, OP_UPSERT, record_changes
+from .tenancy import tenant_local
+from .writer import writer
+
+# Seconds between background scans; 0 (default) leaves scanning to the CLI
+# and the admin endpoint
+SCAN_INTERVAL = float(os.environ.get("TOOL_TABLE_LINK_SCAN_INTERVAL", "0"))
+
+# Seconds allowed per probe (connect + response headers)
+PROBE_TIMEOUT = float(os.environ.get("TOOL_TABLE_LINK_TIMEOUT", "10"))
+
+# Probes in flight overall, and against any single host
+MAX_CONCURRENCY = int(os.environ.get("TOOL_TABLE_LINK_CONCURRENCY", "32"))
+PER_HOST = int(os.environ.get("TOOL_TABLE_LINK_PER_HOST", "4"))
+
+# Internal tools often use private CAs; set to 0 to probe without verification
+VERIFY_TLS = os.environ.get("TOOL_TABLE_LINK_VERIFY_TLS", "1") != "0"
+
+# HEAD answers that don't mean the link is dead, only that HEAD isn't served
+HEAD_FALLBACK = {400, 403, 404, 405, 406, 501}
+
+# Status recorded when no HTTP response arrived (DNS, refused, timeout, TLS)
+UNREACHABLE = 0
+
+# 4xx answers from a live tool that wants a login
+ALIVE_4XX = {401, 403}
+
+USER_AGENT = "tool-table-linkcheck/1.0"
+
+Target = Tuple[str, int, str]  # (entity, id, url)
+Result = Tuple[int, Optional[str], int]  # (status, error, latency ms)
+
+def is_dead(status: Optional[int]) -> bool:
+    """Whether a recorded status means the link is broken"""
+    if status is None:
+        return False
+    return status == UNREACHABLE or (status >= 400 and status not in ALIVE_4XX)
+
+async def fetch_targets(db) -> List[Target]:
+    """Get active http(s) URLs of nodes and auth links"""
+    cursor = await db.execute(
+        """SELECT 'node' AS entity, id, url FROM nodes
+           WHERE is_active = TRUE AND url LIKE 'http%'
+           UNION ALL
+           SELECT 'auth_link', id, url FROM auth_links
+           WHERE is_active = TRUE AND url LIKE 'http%'"""
+    )
+    targets = []
+    for row in await cursor.fetchall():
+        try:
+            scheme = urlsplit(row['url']).scheme
+        except ValueError:
+            continue  # Unparseable (e.g. an unclosed IPv6 bracket); not probed
+        if scheme in ("http", "https"):
+            targets.append((row['entity'], row['id'], row['url']))
+    return targets
+
+class Prober:
+    """Probe URLs on one pooled client with global and per-host limits"""
+
+    def __init__(self, timeout: float = PROBE_TIMEOUT, concurrency: int = MAX_CONCURRENCY,
+                 per_host: int = PER_HOST, verify: bool = VERIFY_TLS):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.verify = verify
+        self.hosts: Dict[str, asyncio.Semaphore] = {}
+
+    async def probe_all(self, urls: List[str]) -> Dict[str, Result]:
+        """Probe each distinct URL once"""
+        # Imported here so servers that never scan don't pay for it
+        import httpx
+
+        limits = httpx.Limits(max_connections=self.concurrency,
+                              max_keepalive_connections=self.concurrency)
+        slots = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(
+            timeout=self.timeout, limits=limits, verify=self.verify,
+            follow_redirects=True, headers={"User-Agent": USER_AGENT},
+        ) as client:
+            async def one(url: str) -> Tuple[str, Result]:
+                host = urlsplit(url).netloc.lower()
+                per_host = self.hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+                # Host first: probes queued behind a busy host must not hold
+                # global slots other hosts could use
+                async with per_host, slots:
+                    return url, await self.probe(client, url)
+
+            return dict(await asyncio.gather(*(one(url) for url in set(urls))))
+
+    async def probe(self, client, url: str) -> Result:
+        """HEAD the URL, falling back to GET when HEAD isn't answered properly"""
+        import httpx
+
+        started = time.perf_counter()
+        try:
+            try:
+                response = await client.head(url)
+                status = response.status_code
+            except (httpx.RemoteProtocolError, httpx.ReadError):
+                status = None  # Some servers drop HEAD requests outright
+            if status is None or status in HEAD_FALLBACK:
+                # Stream so only the headers are read, never the body
+                async with client.stream("GET", url) as response:
+                    status = response.status_code
+            error = None
+        except httpx.TimeoutException:
+            status, error = UNREACHABLE, "timeout"
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+            # InvalidURL isn't an HTTPError; a bad stored URL must not end the scan
+            status, error = UNREACHABLE, f"{type(e).__name__}: {e}"[:200]
+        return status, error, int((time.perf_counter() - started) * 1000)
+
+async def save_results(targets: List[Target], results: Dict[str, Result]) -> List[int]:
+    """Upsert probe results; return ids of nodes whose status changed"""
+    async def apply(db):
+        cursor = await db.execute("SELECT entity, entity_id, status FROM link_status")
+        previous = {(row['entity'], row['entity_id']): row['status'] for row in await cursor.fetchall()}
+        await db.executemany(
+            """INSERT INTO link_status (entity, entity_id, url, status, error, latency_ms, checked_at)
+               VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+               ON CONFLICT(entity, entity_id) DO UPDATE SET
+                   url = excluded.url, status = excluded.status, error = excluded.error,
+                   latency_ms = excluded.latency_ms, checked_at = excluded.checked_at""",
+            [(entity, entity_id, url, *results[url]) for entity, entity_id, url in targets]
+        )
+        # Forget rows whose node or link is gone, inactive or no longer http
+        checked = {(entity, entity_id) for entity, entity_id, _ in targets}
+        stale = [key for key in previous if key not in checked]
+        await db.executemany(
+            "DELETE FROM link_status WHERE entity = ? AND entity_id = ?", stale
+        )
+        # Status shows on node responses; publish transitions so caches and
+        # live clients pick them up (unchanged statuses cost nothing)
+        changed = [
+            entity_id for entity, entity_id, url in targets
+            if entity == ENTITY_NODE and previous.get((entity, entity_id)) != results[url][0]
+        ]
+        changed += [entity_id for entity, entity_id in stale if entity == ENTITY_NODE]
+        if changed:
+            await record_changes(db, ENTITY_NODE, changed, OP_UPSERT)
+        return changed
+
+    return await writer.submit(apply)
+
+async def scan(prober: Optional[Prober] = None) -> dict:
+    """Probe every link and store the results; return a summary"""
+    db = await database.get_db()
+    try:
+        targets = await fetch_targets(db)
+    finally:
+        await db.close()
+
+    started = time.perf_counter()
+    results = await (prober or Prober()).probe_all([url for _, _, url in targets])
+    changed = await save_results(targets, results)
+    dead = sorted({url for url, (status, _, _) in results.items() if is_dead(status)})
+    return {
+        "links": len(targets),
+        "urls": len(results),
+        "dead": len(dead),
+        "changed": len(changed),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+async def fetch_statuses(db, dead_only: bool = False) -> List[dict]:
+    """Get stored probe results, broken links first"""
+    cursor = await db.execute(
+        """SELECT s.entity, s.entity_id, s.url, s.status, s.error, s.latency_ms, s.checked_at,
+                  COALESCE(n.name, a.name) AS name
+           FROM link_status s
+           LEFT JOIN nodes n ON s.entity = 'node' AND n.id = s.entity_id
+           LEFT JOIN auth_links a ON s.entity = 'auth_link' AND a.id = s.entity_id
+           ORDER BY s.status = 0 DESC, s.status DESC, s.url"""
+    )
+    rows = [dict(row) for row in await cursor.fetchall()]
+    return [row for row in rows if is_dead(row['status'])] if dead_only else rows
+
+class LinkScanner:
+    """Rescan periodically in the background when SCAN_INTERVAL is set
+
+    Workers sharing a database skip a run when another one scanned within
+    the interval, so a multi-worker deployment probes about once per interval.
+    """
+
+    def __init__(self, interval: float = SCAN_INTERVAL):
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+        self.scans = 0
+        self.last: Optional[dict] = None
+        metrics.register("linkcheck", self.stats)
+
+    def start(self):
+        if self.interval > 0:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run_once(self) -> dict:
+        """Scan now unless a scan is already running in this process"""
+        if self.running:
+            raise RuntimeError("Link scan already running")
+        self.running = True
+        try:
+            self.last = await scan()
+            self.scans += 1
+            return self.last
+        finally:
+            self.running = False
+
+    async def _due(self) -> bool:
+        db = await database.get_db()
+        try:
+            cursor = await db.execute(
+                "SELECT (julianday('now') - julianday(MAX(checked_at))) * 86400 FROM link_status"
+            )
+            age = (await cursor.fetchone())[0]
+        finally:
+            await db.close()
+        return age is None or age >= self.interval
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.running and await self._due():
+                    await self.run_once()
+            except Exception as e:
+                print(f"Link scan failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"scans": self.scans, "running": self.running, "last": self.last}
+
+# One scanner per tenant
+scanner = tenant_local(LinkScanner)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.linkcheck",
+                                     description="Probe all link URLs and record which are dead")
+    parser.add_argument("--timeout", type=float, default=PROBE_TIMEOUT, help=f"seconds per probe (default: {PROBE_TIMEOUT})")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help=f"probes in flight (default: {MAX_CONCURRENCY})")
+    parser.add_argument("--per-host", type=int, default=PER_HOST, help=f"probes per host (default: {PER_HOST})")
+    parser.add_argument("--dead", action="store_true", help="list dead links after the scan")
+    args = parser.parse_args()
+
+    async def run():
+        await database.init_db()
+        summary = await scan(Prober(args.timeout, args.concurrency, args.per_host))
+        print(f"  ✓ {summary['links']} link(s), {summary['urls']} URL(s) in {summary['seconds']}s: "
+              f"{summary['dead']} dead, {summary['changed']} node status change(s)")
+        if args.dead:
+            db = await database.get_db()
+            try:
+                for row in await fetch_statuses(db, dead_only=True):
+                    print(f"  {row['status']:>3}  {row['url']}  ({row['name']}){'  ' + row['error'] if row['error'] else ''}")
+            finally:
+                await db.close()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,64 @@ Network Management Portal with SQLite Backend
 """
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from contextlib import asynccontextmanager
 import os
 from pathlib import Path
 
 from .database import init_db
-from .routes import nodes, auth_links, search
+from .changes import add_listener, remove_listener, seen_version
+from .coherence import watcher
+from .events import broadcaster
+from .writer import writer
+from .fuzzy import index as fuzzy_index
+from .hits import counter as hit_counter
+from .linkcheck import scanner as link_scanner
+from .snapshot import install_hook as install_snapshot_hook
+from .lifecycle import state, on_drain, remove_drain, install_drain_signals, warm_up, begin_drain
+from .tenancy import registry as tenants, TenantMiddleware
+from . import admission, metrics, profiling
+from .routes import nodes, auth_links, search, changes, events, bootstrap, admin
 
 # Get project root
 PROJECT_ROOT = Path(__file__).parent.parent
 
+async def open_tenant():
+    """Start the current tenant's database, background tasks and listeners"""
+    await init_db()
+    await watcher.start()
+    await writer.start()
+    hit_counter.start()
+    link_scanner.start()
+    broadcaster.version = seen_version()
+    add_listener(broadcaster.publish)
+    add_listener(search.invalidate_cache)
+    add_listener(fuzzy_index.on_commit)
+    on_drain(broadcaster.close_all)
+    install_snapshot_hook()
+    register_metrics()
+
+async def close_tenant():
+    """Flush and stop everything `open_tenant` started"""
+    remove_drain(broadcaster.close_all)
+    broadcaster.close_all()
+    await link_scanner.stop()
+    await hit_counter.stop()
+    await writer.stop()
+    remove_listener(broadcaster.publish)
+    remove_listener(search.invalidate_cache)
+    remove_listener(fuzzy_index.on_commit)
+    await watcher.stop()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan - initialize database on startup"""
-    await init_db()
+    await tenants.start(open_tenant, close_tenant)
+    install_drain_signals()
+    await warm_up()
     yield
+    begin_drain()
+    await tenants.stop()
 
 app = FastAPI(
     title="Tool Table API",
@@ -28,10 +70,23 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Opt-in request profiling (TOOL_TABLE_PROFILE_TOKEN)
+profiling.install(app)
+
+# Bound concurrent API requests and shed overload with 503 (see app.admission)
+app.add_middleware(admission.AdmissionMiddleware)
+
+# Route requests to their portal's database (see app.tenancy)
+app.add_middleware(TenantMiddleware)
+
 # Include routers
 app.include_router(nodes.router)
 app.include_router(auth_links.router)
 app.include_router(search.router)
+app.include_router(changes.router)
+app.include_router(events.router)
+app.include_router(bootstrap.router)
+app.include_router(admin.router)
 
 # Mount static files
 app.mount("/resource", StaticFiles(directory=PROJECT_ROOT / "resource"), name="resource")
@@ -75,3 +130,30 @@ async def serve_js(filename: str):
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok", "version": "2.0.0"}
+
+# Metrics
+def register_metrics():
+    """Register the current tenant's writer, events and coherence counters"""
+    metrics.register("writer", lambda: {"jobs": writer.jobs, "batches": writer.batches})
+    metrics.register("events", lambda: {
+        "subscribers": len(broadcaster.subscribers), "dropped": broadcaster.dropped_total
+    })
+    metrics.register("coherence", lambda: {
+        "seen_version": seen_version(), "remote_changes": watcher.remote_changes
+    })
+    metrics.register("tenants", tenants.stats)
+    metrics.register("admission", admission.stats)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Internal counters of the portal (request coalescing, writer batching, events)"""
+    return metrics.collect()
+
+# Readiness check
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness endpoint - 503 until warmed up and once draining"""
+    if not state.ready:
+        status = "draining" if state.draining else "starting"
+        return JSONResponse({"ready": False, "status": status}, status_code=503)
+    return {"ready": True, "status": "ready"}
@@ -0,0 +1,106 @@
+"""
+Database Maintenance for Tool Table
+Purges orphaned nodes, refreshes planner statistics and reclaims free pages
+
+Usage: python -m app.maintenance [--dry-run] [--no-vacuum]
+"""
+import argparse
+import asyncio
+from typing import List
+
+import aiosqlite
+
+from . import database
+from .changes import ENTITY_NODE, OP_DELETE, record_changes
+from .writer import writer
+
+# Orphan roots (parent row missing) plus everything beneath them
+ORPHANS_CTE = """WITH RECURSIVE orphans(id) AS (
+        SELECT c.id FROM nodes c
+        WHERE c.parent_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM nodes p WHERE p.id = c.parent_id)
+        UNION
+        SELECT n.id FROM nodes n JOIN orphans o ON n.parent_id = o.id
+    )"""
+
+async def find_orphans(db) -> List[int]:
+    """Get ids of nodes whose ancestor chain is broken"""
+    cursor = await db.execute(f"{ORPHANS_CTE} SELECT id FROM orphans")
+    return [row['id'] for row in await cursor.fetchall()]
+
+async def purge_orphans() -> int:
+    """Delete all orphaned nodes in one transaction; return how many"""
+    async def apply(db):
+        ids = await find_orphans(db)
+        if ids:
+            await db.execute(f"{ORPHANS_CTE} DELETE FROM nodes WHERE id IN orphans")
+            await record_changes(db, ENTITY_NODE, ids, OP_DELETE)
+        return len(ids)
+
+    return await writer.submit(apply)
+
+async def page_stats(db) -> dict:
+    """Get page count, free pages and auto_vacuum mode"""
+    stats = {}
+    for pragma in ("page_count", "freelist_count", "page_size", "auto_vacuum"):
+        cursor = await db.execute(f"PRAGMA {pragma}")
+        stats[pragma] = (await cursor.fetchone())[0]
+    return stats
+
+async def compact(db) -> str:
+    """Refresh statistics and return free pages to the filesystem"""
+    await db.execute("ANALYZE")
+    stats = await page_stats(db)
+    if stats["auto_vacuum"] != 2:
+        # One-time conversion; incremental vacuum needs this mode set,
+        # which an existing file only picks up through a full VACUUM
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await db.execute("VACUUM")
+        mode = "full VACUUM (converted to incremental auto_vacuum)"
+    else:
+        await db.execute("PRAGMA incremental_vacuum")
+        mode = "incremental vacuum"
+    await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return mode
+
+async def run(dry_run: bool = False, vacuum: bool = True):
+    """Run all maintenance steps and print a summary"""
+    await database.init_db()
+    # Autocommit connection: VACUUM cannot run inside a transaction
+    db = await aiosqlite.connect(database.db_path(), isolation_level=None)
+    db.row_factory = aiosqlite.Row
+    try:
+        before = await page_stats(db)
+        orphans = await find_orphans(db)
+        print(f"Orphaned nodes: {len(orphans)}")
+        if dry_run:
+            return
+
+        if orphans:
+            removed = await purge_orphans()
+            print(f"  ✓ Removed {removed} orphaned node(s)")
+
+        if vacuum:
+            mode = await compact(db)
+            print(f"  ✓ ANALYZE and {mode}")
+        else:
+            await db.execute("ANALYZE")
+            print("  ✓ ANALYZE")
+
+        after = await page_stats(db)
+        size = lambda s: s["page_count"] * s["page_size"] / 1024
+        print(f"Size: {size(before):.0f} KiB -> {size(after):.0f} KiB "
+              f"(free pages {before['freelist_count']} -> {after['freelist_count']})")
+    finally:
+        await db.close()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance",
+                                     description="Purge orphaned nodes and compact the database")
+    parser.add_argument("--dry-run", action="store_true", help="only count orphans")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip vacuum, only ANALYZE")
+    args = parser.parse_args()
+    asyncio.run(run(dry_run=args.dry_run, vacuum=not args.no_vacuum))
+
+if __name__ == "__main__":
+    main()
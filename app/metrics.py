@@ -0,0 +1,24 @@
+"""
+Metrics Registry for Tool Table
+Components register a callback returning their counters for /api/metrics
+"""
+from typing import Callable, Dict
+
+from .tenancy import tenant_local
+
+class Registry:
+    """Counters callbacks by name"""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], dict]] = {}
+
+# Per tenant, like the components registering into it
+_registry = tenant_local(Registry)
+
+def register(name: str, source: Callable[[], dict]):
+    """Register a counters callback under a name"""
+    _registry.sources[name] = source
+
+def collect() -> dict:
+    """Snapshot all registered counters"""
+    return {name: source() for name, source in _registry.sources.items()}
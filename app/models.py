@@ -41,6 +41,7 @@ class NodeResponse(NodeBase):
     code: str
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    link_status: Optional[int] = None  # Last probe: HTTP status, 0 unreachable, null unchecked
 
     class Config:
         from_attributes = True
@@ -88,6 +89,17 @@ class AuthLinkGroup(BaseModel):
     region: str
     items: List[AuthLinkResponse]
 
+class AuthLinkRegionItem(BaseModel):
+    """One link in a region's ordered list; without id it is created"""
+    id: Optional[int] = None
+    name: str = Field(..., min_length=1, max_length=200)
+    url: str = Field(..., min_length=1)
+    is_active: bool = True
+
+class AuthLinkRegionSync(BaseModel):
+    """A region's complete link list, in display order"""
+    items: List[AuthLinkRegionItem]
+
 # ============ Search Models ============
 
 class SearchResult(BaseModel):
@@ -100,6 +112,17 @@ class SearchResult(BaseModel):
     code: str
     path: str  # Full path like "維運工具 > 臺灣區 > 彰化"
 
+# ============ Change Feed Models ============
+
+class ChangeFeed(BaseModel):
+    """Rows changed since a given data version"""
+    version: int
+    reset: bool = False  # True when the client must reload everything
+    nodes: List[NodeResponse] = []
+    auth_links: List[AuthLinkResponse] = []
+    deleted_nodes: List[int] = []
+    deleted_auth_links: List[int] = []
+
 # ============ API Response Models ============
 
 class APIResponse(BaseModel):
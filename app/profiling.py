@@ -0,0 +1,219 @@
+"""
+Request Profiling for Tool Table
+Opt-in sampling profiler producing flame-graph input and a time breakdown
+
+Enabled only when TOOL_TABLE_PROFILE_TOKEN is set; otherwise the middleware
+is not installed at all. A request is profiled when it carries the token in
+an `X-Profile` header or a `profile` query parameter. Its stacks are written
+in collapsed format (flamegraph.pl, speedscope, inferno) to
+TOOL_TABLE_PROFILE_DIR, and the response gets `X-Profile-File` plus a
+`Server-Timing` header splitting sampled time into sql / aiosqlite /
+pydantic / json / app. Samples cover the whole process, so profile on a
+quiet worker.
+"""
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from . import database, tenancy
+
+PROFILE_TOKEN = os.environ.get("TOOL_TABLE_PROFILE_TOKEN")
+PROFILE_DIR = Path(os.environ.get("TOOL_TABLE_PROFILE_DIR", database.DB_DIR / "profiles"))
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.001
+
+# Streaming responses never finish, so they are never profiled
+SKIP_PATHS = {"/api/events"}
+
+CATEGORIES = ("sql", "aiosqlite", "pydantic", "json", "app")
+
+PROJECT_ROOT = str(Path(__file__).parent.parent) + os.sep
+
+# Standard library and site-packages prefixes, cut from frame labels
+LIBRARY_PREFIX = re.compile(r".*/lib/python3\.\d+/(site-packages/)?")
+
+def frame_label(frame) -> str:
+    """`function (module path)` with library and project prefixes cut"""
+    filename = LIBRARY_PREFIX.sub("", frame.f_code.co_filename)
+    if filename.startswith(PROJECT_ROOT):
+        filename = filename[len(PROJECT_ROOT):]
+    return f"{frame.f_code.co_name} ({filename})"
+
+def classify(thread_name: str, stack: List[str]) -> str:
+    """Attribute one sample to a category, innermost match wins"""
+    if thread_name != "loop":
+        return "sql"
+    for label in reversed(stack):
+        if "pydantic" in label:
+            return "pydantic"
+        if "(json/" in label or "jsonable_encoder" in label or "render (starlette/responses" in label:
+            return "json"
+        if "aiosqlite/" in label:
+            return "aiosqlite"
+    return "app"
+
+# Overlapping samplers share one lowered switch interval: the first one
+# saves the original, the last one to finish puts it back
+_switch_lock = threading.Lock()
+_switch_users = 0
+_switch_saved = 0.0
+
+def lower_switch_interval(interval: float):
+    global _switch_users, _switch_saved
+    with _switch_lock:
+        if _switch_users == 0:
+            _switch_saved = sys.getswitchinterval()
+        _switch_users += 1
+        sys.setswitchinterval(min(sys.getswitchinterval(), interval))
+
+def restore_switch_interval():
+    global _switch_users
+    with _switch_lock:
+        _switch_users -= 1
+        if _switch_users == 0:
+            sys.setswitchinterval(_switch_saved)
+
+class Sampler(threading.Thread):
+    """Sample the event loop thread and busy aiosqlite threads"""
+
+    def __init__(self, loop_thread: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.seconds: Counter = Counter()
+        self.stopped = threading.Event()
+        self.last = time.perf_counter()
+
+    def run(self):
+        # The loop thread holds the GIL between awaits; a shorter switch
+        # interval lets the sampler in close to the requested rate
+        lower_switch_interval(self.interval / 2)
+        try:
+            while not self.stopped.wait(self.interval):
+                self.sample()
+        finally:
+            restore_switch_interval()
+
+    def sample(self):
+        # Each sample stands for the time since the previous one
+        now = time.perf_counter()
+        elapsed, self.last = now - self.last, now
+        threads = {t.ident: t for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            if ident == self.loop_thread:
+                name = "loop"
+            elif frame.f_code.co_name == "_connection_worker_thread":
+                continue  # aiosqlite thread waiting for work
+            elif self._in_aiosqlite(frame):
+                thread = threads.get(ident)
+                name = thread.name if thread else str(ident)
+            else:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            if name == "loop" and len(stack) <= 1:
+                continue  # Loop idle in C (uvloop) or the selector
+            if name == "loop" and stack[-1].startswith("select ("):
+                continue
+            self.stacks[";".join([name] + stack)] += 1
+            self.seconds[classify(name, stack)] += elapsed
+
+    @staticmethod
+    def _in_aiosqlite(frame) -> bool:
+        while frame is not None:
+            if frame.f_code.co_name == "_connection_worker_thread":
+                return True
+            frame = frame.f_back
+        return False
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def profiled(scope) -> bool:
+    """Whether the request asked for profiling with the right token"""
+    if scope["type"] != "http" or tenancy.route_path(scope) in SKIP_PATHS:
+        return False
+    for key, value in scope["headers"]:
+        if key == b"x-profile" and value.decode() == PROFILE_TOKEN:
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("profile", [None])[0] == PROFILE_TOKEN
+
+def write_profile(scope, stacks: Counter) -> Path:
+    """Write collapsed stacks; one line per distinct stack with its count"""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = scope["path"].strip("/").replace("/", "_") or "root"
+    path = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{slug}-{time.monotonic_ns() % 10**6}.folded"
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+    return path
+
+def server_timing(elapsed: float, seconds: Counter) -> str:
+    """Server-Timing header value; category durations are sample estimates
+
+    sql runs on aiosqlite threads and may overlap the other categories.
+    """
+    parts = [f"total;dur={elapsed * 1000:.1f}"]
+    for category in CATEGORIES:
+        parts.append(f"{category};dur={seconds.get(category, 0) * 1000:.1f}")
+    return ", ".join(parts)
+
+class ProfilingMiddleware:
+    """ASGI middleware; holds back the response start until the body is done"""
+
+    def __init__(self, app, interval: float = SAMPLE_INTERVAL):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if not profiled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = Sampler(threading.get_ident(), self.interval)
+        start_message: Optional[dict] = None
+        body: List[dict] = []
+        started = time.perf_counter()
+        sampler.start()
+
+        async def buffered_send(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            body.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                elapsed = time.perf_counter() - started
+                sampler.stop()
+                path = await asyncio.to_thread(write_profile, scope, sampler.stacks)
+                headers: List[Tuple[bytes, bytes]] = list(start_message.get("headers", []))
+                headers.append((b"x-profile-file", str(path).encode()))
+                headers.append((b"server-timing", server_timing(elapsed, sampler.seconds).encode()))
+                await send({**start_message, "headers": headers})
+                for buffered in body:
+                    await send(buffered)
+
+        try:
+            await self.app(scope, receive, buffered_send)
+        finally:
+            if sampler.is_alive():
+                sampler.stop()
+
+def install(app):
+    """Add the profiling middleware when a profile token is configured"""
+    if PROFILE_TOKEN:
+        app.add_middleware(ProfilingMiddleware)
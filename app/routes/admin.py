@@ -0,0 +1,47 @@
+"""
+Admin API Routes
+Online backup and restore, link health
+"""
+from fastapi import APIRouter, HTTPException
+
+from .. import backup, database, linkcheck
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+@router.get("/backups")
+async def get_backups():
+    """List database snapshots, newest first"""
+    return backup.list_backups()
+
+@router.post("/backups")
+async def create_backup():
+    """Snapshot the live database (keeps the newest TOOL_TABLE_BACKUP_KEEP)"""
+    return await backup.backup()
+
+@router.post("/backups/{name}/restore")
+async def restore_backup(name: str):
+    """Replace the database contents with a snapshot"""
+    try:
+        version = await backup.restore(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "message": f"Restored {name}", "version": version}
+
+@router.get("/links")
+async def get_link_statuses(dead: bool = False):
+    """Last probe result per link, broken links first"""
+    db = await database.get_db()
+    try:
+        return await linkcheck.fetch_statuses(db, dead_only=dead)
+    finally:
+        await db.close()
+
+@router.post("/links/scan")
+async def scan_links():
+    """Probe every link now and wait for the results"""
+    try:
+        return await linkcheck.scanner.run_once()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -2,48 +2,104 @@
 Auth Links API Routes
 CRUD operations for internet access authentication links
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from typing import List
+import json
 
 from ..database import get_db
+from ..writer import writer
+from ..singleflight import SingleFlight
+from ..tenancy import tenant_local
+from ..serialize import AUTH_LINK_COLUMNS, AuthLinkRow, fetch_rows, json_response
+from ..changes import ENTITY_AUTH_LINK, OP_UPSERT, OP_DELETE, get_version, seen_version, record_change, record_changes
 from ..models import (
-    AuthLinkCreate, AuthLinkUpdate, AuthLinkResponse, AuthLinkGroup
+    AuthLinkCreate, AuthLinkUpdate, AuthLinkResponse, AuthLinkGroup, AuthLinkRegionSync
 )
 
 router = APIRouter(prefix="/api/auth-links", tags=["auth-links"])
 
+# Active links grouped by region as one JSON document, built by SQLite.
+# Matches AuthLinkGroup output: AuthLinkResponse key order, booleans for
+# is_active and CURRENT_TIMESTAMP values rendered with 'T'. Each region's
+# items come from a correlated, ordered subquery: SQLite keeps an aggregate's
+# input order through a plain subquery, but not through GROUP BY.
+AUTH_LINK_GROUPS_SQL = """
+    SELECT json_group_array(json(grp)) FROM (
+        SELECT json_object('region', r.region, 'items', (
+            SELECT json_group_array(json(item)) FROM (
+                SELECT json_object(
+                    'region', region, 'name', name, 'url', url,
+                    'sort_order', COALESCE(sort_order, 0),
+                    'is_active', json(CASE WHEN is_active THEN 'true' ELSE 'false' END),
+                    'id', id, 'created_at', replace(created_at, ' ', 'T')
+                ) AS item
+                FROM auth_links a
+                WHERE a.region = r.region AND a.is_active = TRUE
+                ORDER BY a.sort_order, a.id
+            )
+        )) AS grp
+        FROM (SELECT DISTINCT region FROM auth_links WHERE is_active = TRUE) r
+        ORDER BY r.region
+    )
+"""
+
+# Coalesces concurrent group reads
+flights = tenant_local(lambda: SingleFlight("auth_links"))
+
+class GroupsCache:
+    """Last grouped read, valid until the data version moves"""
+    version: int = -1
+    body: bytes = b"[]"
+
+_groups = tenant_local(GroupsCache)
+
+async def fetch_auth_link_groups_json(db) -> bytes:
+    """Get active auth links grouped by region, as JSON bytes"""
+    cursor = await db.execute(AUTH_LINK_GROUPS_SQL)
+    row = await cursor.fetchone()
+    return row[0].encode()
+
+async def fetch_auth_link_groups(db) -> List[dict]:
+    """Get active auth links grouped by region"""
+    return json.loads(await fetch_auth_link_groups_json(db))
+
+async def cached_auth_link_groups() -> bytes:
+    """Grouped links at the current data version, built once per version"""
+    if _groups.version >= seen_version():
+        return _groups.body
+
+    async def load() -> bytes:
+        db = await get_db()
+        try:
+            # Read the version in the same snapshot as the rows
+            await db.execute("BEGIN")
+            try:
+                version = await get_version(db)
+                body = await fetch_auth_link_groups_json(db)
+            finally:
+                await db.rollback()
+        finally:
+            await db.close()
+        if version > _groups.version:
+            _groups.version, _groups.body = version, body
+        return body
+
+    return await flights.do(seen_version(), load)
+
 @router.get("", response_model=List[AuthLinkGroup])
 async def get_auth_links():
     """Get all auth links grouped by region"""
-    db = await get_db()
-    try:
-        cursor = await db.execute(
-            "SELECT * FROM auth_links WHERE is_active = TRUE ORDER BY region, sort_order"
-        )
-        rows = await cursor.fetchall()
-        
-        # Group by region
-        groups = {}
-        for row in rows:
-            region = row['region']
-            if region not in groups:
-                groups[region] = []
-            groups[region].append(dict(row))
-        
-        return [{"region": region, "items": items} for region, items in groups.items()]
-    finally:
-        await db.close()
+    return Response(await cached_auth_link_groups(), media_type="application/json")
 
 @router.get("/all", response_model=List[AuthLinkResponse])
 async def get_all_auth_links():
     """Get all auth links as flat list (for admin)"""
     db = await get_db()
     try:
-        cursor = await db.execute(
-            "SELECT * FROM auth_links ORDER BY region, sort_order"
+        rows = await fetch_rows(
+            db, AuthLinkRow, f"SELECT {AUTH_LINK_COLUMNS} FROM auth_links ORDER BY region, sort_order, id"
         )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        return json_response([row.as_dict() for row in rows])
     finally:
         await db.close()
 
@@ -65,28 +121,27 @@ async def get_auth_link(link_id: int):
 @router.post("", response_model=AuthLinkResponse)
 async def create_auth_link(link: AuthLinkCreate):
     """Create a new auth link"""
-    db = await get_db()
-    try:
+    async def insert(db):
         cursor = await db.execute(
             """INSERT INTO auth_links (region, name, url, sort_order, is_active)
                VALUES (?, ?, ?, ?, ?)""",
             (link.region, link.name, link.url, link.sort_order, link.is_active)
         )
-        await db.commit()
+        link_id = cursor.lastrowid
+        await record_change(db, ENTITY_AUTH_LINK, link_id, OP_UPSERT)
         
         cursor = await db.execute(
-            "SELECT * FROM auth_links WHERE id = ?", (cursor.lastrowid,)
+            "SELECT * FROM auth_links WHERE id = ?", (link_id,)
         )
         row = await cursor.fetchone()
         return dict(row)
-    finally:
-        await db.close()
+    
+    return await writer.submit(insert)
 
 @router.put("/{link_id}", response_model=AuthLinkResponse)
 async def update_auth_link(link_id: int, link: AuthLinkUpdate):
     """Update an auth link"""
-    db = await get_db()
-    try:
+    async def apply(db):
         cursor = await db.execute(
             "SELECT * FROM auth_links WHERE id = ?", (link_id,)
         )
@@ -109,21 +164,20 @@ async def update_auth_link(link_id: int, link: AuthLinkUpdate):
                 f"UPDATE auth_links SET {', '.join(updates)} WHERE id = ?",
                 values
             )
-            await db.commit()
+            await record_change(db, ENTITY_AUTH_LINK, link_id, OP_UPSERT)
         
         cursor = await db.execute(
             "SELECT * FROM auth_links WHERE id = ?", (link_id,)
         )
         row = await cursor.fetchone()
         return dict(row)
-    finally:
-        await db.close()
+    
+    return await writer.submit(apply)
 
 @router.delete("/{link_id}")
 async def delete_auth_link(link_id: int):
     """Delete an auth link"""
-    db = await get_db()
-    try:
+    async def apply(db):
         cursor = await db.execute(
             "SELECT * FROM auth_links WHERE id = ?", (link_id,)
         )
@@ -131,10 +185,10 @@ async def delete_auth_link(link_id: int):
             raise HTTPException(status_code=404, detail="Auth link not found")
         
         await db.execute("DELETE FROM auth_links WHERE id = ?", (link_id,))
-        await db.commit()
-        return {"success": True, "message": "Auth link deleted"}
-    finally:
-        await db.close()
+        await record_change(db, ENTITY_AUTH_LINK, link_id, OP_DELETE)
+    
+    await writer.submit(apply)
+    return {"success": True, "message": "Auth link deleted"}
 
 @router.get("/regions/list")
 async def get_regions():
@@ -148,3 +202,67 @@ async def get_regions():
         return [row['region'] for row in rows]
     finally:
         await db.close()
+
+@router.put("/regions/{region}", response_model=List[AuthLinkResponse])
+async def sync_region(region: str, sync: AuthLinkRegionSync):
+    """Replace a region's links with the given ordered list in one transaction
+
+    Items with an id are updated (and moved here from another region if
+    needed), items without one are created, and links of the region that
+    are not listed are deleted. sort_order follows list position.
+    """
+    region = region.strip()
+    if not region or len(region) > 100:
+        raise HTTPException(status_code=400, detail="Invalid region")
+    ids = [item.id for item in sync.items if item.id is not None]
+    if len(ids) != len(set(ids)):
+        raise HTTPException(status_code=400, detail="Duplicate link id")
+
+    async def apply(db):
+        cursor = await db.execute(
+            f"SELECT id, region, name, url, sort_order, is_active FROM auth_links WHERE region = ? OR id IN ({','.join('?' * len(ids))})",
+            (region, *ids)
+        )
+        existing = {row['id']: tuple(row) for row in await cursor.fetchall()}
+        missing = [link_id for link_id in ids if link_id not in existing]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Auth link {missing[0]} not found")
+
+        updates, inserts = [], []
+        for position, item in enumerate(sync.items):
+            values = (region, item.name, item.url, position, item.is_active)
+            if item.id is None:
+                inserts.append(values)
+            elif existing[item.id][1:] != values:
+                updates.append((*values, item.id))
+        deleted = [
+            link_id for link_id, row in existing.items()
+            if row[1] == region and link_id not in set(ids)
+        ]
+
+        await db.executemany("DELETE FROM auth_links WHERE id = ?", [(link_id,) for link_id in deleted])
+        await db.executemany(
+            "UPDATE auth_links SET region = ?, name = ?, url = ?, sort_order = ?, is_active = ? WHERE id = ?",
+            updates
+        )
+        cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM auth_links")
+        last_id = (await cursor.fetchone())[0]
+        await db.executemany(
+            "INSERT INTO auth_links (region, name, url, sort_order, is_active) VALUES (?, ?, ?, ?, ?)",
+            inserts
+        )
+        # The writer is the only connection writing, so new ids follow last_id
+        cursor = await db.execute("SELECT id FROM auth_links WHERE id > ? ORDER BY id", (last_id,))
+        created = [row['id'] for row in await cursor.fetchall()]
+
+        await record_changes(db, ENTITY_AUTH_LINK, deleted, OP_DELETE)
+        await record_changes(db, ENTITY_AUTH_LINK, [values[-1] for values in updates] + created, OP_UPSERT)
+
+        rows = await fetch_rows(
+            db, AuthLinkRow,
+            f"SELECT {AUTH_LINK_COLUMNS} FROM auth_links WHERE region = ? ORDER BY sort_order, id",
+            (region,)
+        )
+        return [row.as_dict() for row in rows]
+
+    return json_response(await writer.submit(apply))
@@ -0,0 +1,108 @@
+"""
+Bootstrap API Route
+Everything the portal needs for first paint in one cached, compressed payload
+"""
+from fastapi import APIRouter, Request, Response
+import gzip
+from typing import Optional
+
+from ..database import get_db
+from ..changes import get_version, seen_version
+from ..lifecycle import add_warmup
+from ..tenancy import tenant_local
+from ..serialize import NODE_COLUMNS, fetch_nodes, encode
+from .auth_links import fetch_auth_link_groups
+from .search import ICON_DIR, list_icons
+
+router = APIRouter(prefix="/api", tags=["bootstrap"])
+
+class BootstrapCache:
+    """Last rendered payload, as JSON and gzip bytes"""
+    version: int = -1
+    icons_mtime: float = -1
+    etag: Optional[str] = None
+    body: bytes = b""
+    gzipped: bytes = b""
+
+_cache = tenant_local(BootstrapCache)
+
+def icons_mtime() -> float:
+    """Icon directory mtime; changes on upload, rename and delete"""
+    try:
+        return ICON_DIR.stat().st_mtime
+    except OSError:
+        return 0
+
+async def build_payload(db) -> dict:
+    """Read roots, their children, auth links and version in one snapshot"""
+    # A read transaction keeps the version consistent with the rows
+    await db.execute("BEGIN")
+    try:
+        version = await get_version(db)
+        rows = await fetch_nodes(
+            db,
+            f"""SELECT {NODE_COLUMNS} FROM nodes
+               WHERE is_active = TRUE AND (
+                   parent_id IS NULL OR parent_id IN (
+                       SELECT id FROM nodes WHERE parent_id IS NULL AND is_active = TRUE
+                   )
+               )
+               ORDER BY sort_order, code"""
+        )
+        roots = []
+        children = {}
+        for row in rows:
+            if row.parent_id is None:
+                roots.append(row.as_dict())
+            else:
+                children.setdefault(str(row.parent_id), []).append(row.as_dict())
+        auth_links = await fetch_auth_link_groups(db)
+    finally:
+        await db.rollback()
+
+    return {
+        "version": version,
+        "roots": roots,
+        "children": children,
+        "auth_links": auth_links,
+        "icons": list_icons(),
+    }
+
+async def refresh_cache() -> BootstrapCache:
+    """Return the cached payload, rebuilding it if data or icons changed"""
+    mtime = icons_mtime()
+    if _cache.version >= seen_version() and _cache.icons_mtime == mtime:
+        return _cache
+
+    db = await get_db()
+    try:
+        payload = await build_payload(db)
+    finally:
+        await db.close()
+
+    body = encode(payload)
+    _cache.version = payload["version"]
+    _cache.icons_mtime = mtime
+    _cache.etag = f'"{payload["version"]}-{int(mtime * 1000)}"'
+    _cache.body = body
+    _cache.gzipped = gzip.compress(body, compresslevel=6)
+    return _cache
+
+add_warmup(refresh_cache)
+
+@router.get("/bootstrap")
+async def get_bootstrap(request: Request):
+    """Get root folders, first-level children, auth links, icons and version"""
+    cache = await refresh_cache()
+    headers = {
+        "ETag": cache.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == cache.etag:
+        return Response(status_code=304, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(cache.gzipped, media_type="application/json", headers=headers)
+    return Response(cache.body, media_type="application/json", headers=headers)
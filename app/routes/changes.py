@@ -0,0 +1,21 @@
+"""
+Changes API Routes
+Incremental change feed for clients patching a cached tree
+"""
+from fastapi import APIRouter, Query
+
+from ..database import get_db
+from ..changes import fetch_changes
+from ..serialize import json_response
+from ..models import ChangeFeed
+
+router = APIRouter(prefix="/api", tags=["changes"])
+
+@router.get("/changes", response_model=ChangeFeed)
+async def get_changes(since: int = Query(0, ge=0)):
+    """Get rows upserted and deleted after data version `since`"""
+    db = await get_db()
+    try:
+        return json_response(await fetch_changes(db, since))
+    finally:
+        await db.close()
@@ -0,0 +1,26 @@
+"""
+Events API Routes
+Server-Sent Events stream of committed changes
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..events import broadcaster
+from ..lifecycle import state
+
+router = APIRouter(prefix="/api", tags=["events"])
+
+@router.get("/events")
+async def stream_events():
+    """Stream change notifications (version, entity, id, op) as SSE"""
+    if state.draining:
+        raise HTTPException(status_code=503, detail="Server is shutting down")
+    subscriber = broadcaster.subscribe()
+    return StreamingResponse(
+        broadcaster.stream(subscriber),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+        },
+    )
@@ -2,11 +2,22 @@
 Nodes API Routes
 CRUD operations for hierarchical nodes (categories and links)
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import Dict, List, Optional
 import aiosqlite
+import sqlite3
 
 from ..database import get_db
+from ..lifecycle import add_warmup
+from ..writer import writer
+from ..singleflight import SingleFlight
+from ..tenancy import tenant_local
+from ..serialize import NODE_COLUMNS, node_columns, fetch_nodes, encode
+from ..hits import counter as hits, POPULARITY_SQL
+from ..changes import (
+    ENTITY_NODE, OP_UPSERT, OP_DELETE, get_version, seen_version,
+    record_change, record_changes
+)
 from ..models import (
     NodeCreate, NodeUpdate, NodeMove, NodeResponse, 
     NodeTreeItem, NodeReorder, APIResponse
@@ -14,24 +25,29 @@ from ..models import (
 
 router = APIRouter(prefix="/api/nodes", tags=["nodes"])
 
+# Coalesces concurrent identical reads
+flights = tenant_local(lambda: SingleFlight("nodes"))
+
 # ============ Helper Functions ============
 
+def next_code_number(codes) -> int:
+    """Next number after the highest numeric last segment among sibling codes"""
+    highest = 0
+    for code in codes:
+        try:
+            highest = max(highest, int(code.split('-')[-1]))
+        except ValueError:
+            continue
+    return highest + 1
+
 async def generate_code(db, parent_id: Optional[int]) -> str:
     """Generate next code based on parent"""
+    # Siblings are compared numerically, so "-10" follows "-9"
     if parent_id is None:
         # Root level - find max root code
-        cursor = await db.execute(
-            "SELECT code FROM nodes WHERE parent_id IS NULL ORDER BY code DESC LIMIT 1"
-        )
-        row = await cursor.fetchone()
-        if row:
-            try:
-                next_num = int(row['code']) + 1
-            except ValueError:
-                next_num = 1
-        else:
-            next_num = 1
-        return str(next_num)
+        cursor = await db.execute("SELECT code FROM nodes WHERE parent_id IS NULL")
+        rows = await cursor.fetchall()
+        return str(next_code_number(row['code'] for row in rows))
     else:
         # Child level - find parent code and max sibling
         cursor = await db.execute("SELECT code FROM nodes WHERE id = ?", (parent_id,))
@@ -40,41 +56,47 @@ async def generate_code(db, parent_id: Optional[int]) -> str:
             raise HTTPException(status_code=404, detail="Parent not found")
         
         parent_code = parent['code']
-        cursor = await db.execute(
-            "SELECT code FROM nodes WHERE parent_id = ? ORDER BY code DESC LIMIT 1",
-            (parent_id,)
+        cursor = await db.execute("SELECT code FROM nodes WHERE parent_id = ?", (parent_id,))
+        rows = await cursor.fetchall()
+        return f"{parent_code}-{next_code_number(row['code'] for row in rows)}"
+
+SUBTREE_CTE = """WITH RECURSIVE subtree(id) AS (
+        SELECT id FROM nodes WHERE id = ?
+        UNION
+        SELECT n.id FROM nodes n JOIN subtree s ON n.parent_id = s.id
+    )"""
+
+async def delete_subtree(db, node_id: int) -> List[int]:
+    """Delete a node and all its descendants as one set; return their ids
+
+    The ids are read first because rows removed by ON DELETE CASCADE are
+    not reported by RETURNING. Both statements run in the caller's
+    transaction, so they see the same subtree.
+    """
+    cursor = await db.execute(f"{SUBTREE_CTE} SELECT id FROM subtree", (node_id,))
+    ids = [row['id'] for row in await cursor.fetchall()]
+    if ids:
+        await db.execute(
+            f"{SUBTREE_CTE} DELETE FROM nodes WHERE id IN subtree", (node_id,)
         )
-        row = await cursor.fetchone()
-        if row:
-            # Extract last segment and increment
-            last_segment = row['code'].split('-')[-1]
-            try:
-                next_num = int(last_segment) + 1
-            except ValueError:
-                next_num = 1
-        else:
-            next_num = 1
-        return f"{parent_code}-{next_num}"
+    return ids
 
 async def build_tree(db, parent_id: Optional[int] = None) -> List[dict]:
-    """Recursively build tree structure"""
-    if parent_id is None:
-        cursor = await db.execute(
-            "SELECT * FROM nodes WHERE parent_id IS NULL AND is_active = TRUE ORDER BY sort_order, code"
-        )
-    else:
-        cursor = await db.execute(
-            "SELECT * FROM nodes WHERE parent_id = ? AND is_active = TRUE ORDER BY sort_order, code",
-            (parent_id,)
-        )
-    
-    rows = await cursor.fetchall()
-    result = []
+    """Build the active tree under parent_id (roots when None)
+
+    Reads all active nodes in one query and links them in memory; nodes
+    under an inactive folder are left out, as they are not reachable.
+    """
+    rows = await fetch_nodes(
+        db,
+        f"SELECT {NODE_COLUMNS} FROM nodes WHERE is_active = TRUE ORDER BY sort_order, code"
+    )
+    children: Dict[Optional[int], List[dict]] = {}
     for row in rows:
-        node = dict(row)
-        node['children'] = await build_tree(db, node['id'])
-        result.append(node)
-    return result
+        node = row.as_dict()
+        node['children'] = children.setdefault(row.id, [])
+        children.setdefault(row.parent_id, []).append(node)
+    return children.get(parent_id, [])
 
 async def get_node_path(db, node_id: int) -> str:
     """Get full path of a node"""
@@ -94,126 +116,181 @@ async def get_node_path(db, node_id: int) -> str:
     
     return " > ".join(path_parts)
 
+async def warm_tree():
+    """Page the node table into SQLite's cache before taking traffic"""
+    db = await get_db()
+    try:
+        await build_tree(db)
+    finally:
+        await db.close()
+
+add_warmup(warm_tree)
+
 # ============ CRUD Routes ============
 
 @router.get("", response_model=List[NodeResponse])
 async def get_root_nodes():
     """Get all root nodes"""
-    db = await get_db()
-    try:
-        cursor = await db.execute(
-            "SELECT * FROM nodes WHERE parent_id IS NULL AND is_active = TRUE ORDER BY sort_order, code"
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
-    finally:
-        await db.close()
+    async def load():
+        db = await get_db()
+        try:
+            rows = await fetch_nodes(
+                db,
+                f"SELECT {NODE_COLUMNS} FROM nodes WHERE parent_id IS NULL AND is_active = TRUE ORDER BY sort_order, code"
+            )
+            return encode([row.as_dict() for row in rows])
+        finally:
+            await db.close()
+    
+    return Response(await flights.do(("roots", seen_version()), load), media_type="application/json")
 
-@router.get("/tree")
+@router.get("/tree", response_model=List[NodeTreeItem])
 async def get_full_tree():
     """Get complete tree structure"""
-    db = await get_db()
-    try:
-        tree = await build_tree(db)
-        return tree
-    finally:
-        await db.close()
+    async def load():
+        db = await get_db()
+        try:
+            # Read the version first so a concurrent write is replayed, not lost
+            version = await get_version(db)
+            return version, encode(await build_tree(db))
+        finally:
+            await db.close()
+    
+    version, body = await flights.do(("tree", seen_version()), load)
+    return Response(body, media_type="application/json", headers={"X-Data-Version": str(version)})
 
 @router.get("/{node_id}", response_model=NodeResponse)
 async def get_node(node_id: int):
     """Get single node by ID"""
     db = await get_db()
     try:
-        cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
-        row = await cursor.fetchone()
-        if not row:
+        rows = await fetch_nodes(db, f"SELECT {NODE_COLUMNS} FROM nodes WHERE id = ?", (node_id,))
+        if not rows:
             raise HTTPException(status_code=404, detail="Node not found")
-        return dict(row)
+        return rows[0].as_dict()
     finally:
         await db.close()
 
 @router.get("/{node_id}/children", response_model=List[NodeResponse])
-async def get_children(node_id: int):
-    """Get children of a node"""
-    db = await get_db()
-    try:
-        cursor = await db.execute(
-            "SELECT * FROM nodes WHERE parent_id = ? AND is_active = TRUE ORDER BY sort_order, code",
-            (node_id,)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
-    finally:
-        await db.close()
+async def get_children(node_id: int, sort: str = Query("default", pattern="^(default|popular)$")):
+    """Get children of a node (sort=popular: most clicked first)"""
+    async def load():
+        db = await get_db()
+        try:
+            if sort == "popular":
+                rows = await fetch_nodes(
+                    db,
+                    f"""SELECT {node_columns('n')} FROM nodes n LEFT JOIN {POPULARITY_SQL} h ON h.node_id = n.id
+                        WHERE n.parent_id = ? AND n.is_active = TRUE
+                        ORDER BY COALESCE(h.hits, 0) DESC, n.sort_order, n.code""",
+                    (node_id,)
+                )
+            else:
+                rows = await fetch_nodes(
+                    db,
+                    f"SELECT {NODE_COLUMNS} FROM nodes WHERE parent_id = ? AND is_active = TRUE ORDER BY sort_order, code",
+                    (node_id,)
+                )
+            return encode([row.as_dict() for row in rows])
+        finally:
+            await db.close()
+    
+    body = await flights.do(("children", node_id, sort, seen_version()), load)
+    return Response(body, media_type="application/json")
+
+@router.post("/{node_id}/hit")
+async def record_hit(node_id: int):
+    """Count a click on a node (buffered, written in batches)"""
+    hits.record(node_id)
+    return {"success": True}
 
 @router.get("/code/{code}")
 async def get_by_code(code: str):
     """Get node by code (e.g., 3-2-1)"""
-    db = await get_db()
-    try:
-        cursor = await db.execute(
-            "SELECT * FROM nodes WHERE code = ? AND is_active = TRUE", (code,)
-        )
-        row = await cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Node not found")
-        
-        # Also get children
-        node = dict(row)
-        cursor = await db.execute(
-            "SELECT * FROM nodes WHERE parent_id = ? AND is_active = TRUE ORDER BY sort_order, code",
-            (node['id'],)
-        )
-        children = await cursor.fetchall()
-        node['items'] = [dict(child) for child in children]
-        return node
-    finally:
-        await db.close()
+    async def load():
+        db = await get_db()
+        try:
+            rows = await fetch_nodes(
+                db, f"SELECT {NODE_COLUMNS} FROM nodes WHERE code = ? AND is_active = TRUE", (code,)
+            )
+            if not rows:
+                raise HTTPException(status_code=404, detail="Node not found")
+            
+            # Also get children
+            node = rows[0].as_dict()
+            children = await fetch_nodes(
+                db,
+                f"SELECT {NODE_COLUMNS} FROM nodes WHERE parent_id = ? AND is_active = TRUE ORDER BY sort_order, code",
+                (node['id'],)
+            )
+            node['items'] = [child.as_dict() for child in children]
+            return encode(node)
+        finally:
+            await db.close()
+    
+    return Response(await flights.do(("code", code, seen_version()), load), media_type="application/json")
 
 @router.post("", response_model=NodeResponse)
 async def create_node(node: NodeCreate):
     """Create a new node"""
-    db = await get_db()
-    try:
-        # Validate link type requires URL
-        if node.node_type == 'link' and not node.url:
-            raise HTTPException(status_code=400, detail="Link type requires URL")
-        
-        # Retry logic for code generation conflicts
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                # Generate code if not provided
-                code = node.code or await generate_code(db, node.parent_id)
-                
-                cursor = await db.execute(
-                    """INSERT INTO nodes (parent_id, code, name, node_type, icon, url, sort_order, is_active)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (node.parent_id, code, node.name, node.node_type, 
-                     node.icon, node.url, node.sort_order, node.is_active)
-                )
-                await db.commit()
-                
-                # Return created node
-                cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (cursor.lastrowid,))
-                row = await cursor.fetchone()
-                return dict(row)
-            except Exception as e:
-                if "UNIQUE constraint" in str(e) and attempt < max_retries - 1:
-                    # Code conflict, increment and retry
-                    await db.rollback()
-                    continue
-                raise
+    # Validate link type requires URL
+    if node.node_type == 'link' and not node.url:
+        raise HTTPException(status_code=400, detail="Link type requires URL")
+    
+    async def insert(db):
+        # Generate code if not provided
+        code = node.code or await generate_code(db, node.parent_id)
+        try:
+            cursor = await db.execute(
+                """INSERT INTO nodes (parent_id, code, name, node_type, icon, url, sort_order, is_active)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (node.parent_id, code, node.name, node.node_type, 
+                 node.icon, node.url, node.sort_order, node.is_active)
+            )
+        except sqlite3.IntegrityError as e:
+            if "UNIQUE constraint" in str(e):
+                raise HTTPException(status_code=409, detail=f"Code {code} already exists")
+            if "FOREIGN KEY constraint" in str(e):
+                raise HTTPException(status_code=404, detail="Parent not found")
+            raise
+        node_id = cursor.lastrowid
+        await record_change(db, ENTITY_NODE, node_id, OP_UPSERT)
         
-        raise HTTPException(status_code=500, detail="Failed to generate unique code")
-    finally:
-        await db.close()
+        # Return created node
+        cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
+        row = await cursor.fetchone()
+        return dict(row)
+    
+    return await writer.submit(insert)
+
+@router.put("/reorder")
+async def reorder_nodes(reorder: NodeReorder):
+    """Batch reorder nodes"""
+    if not reorder.items:
+        return {"success": True, "message": "Nodes reordered"}
+    
+    async def apply(db):
+        # Only publish nodes that exist; unknown ids would read as deletes
+        ids = list(dict.fromkeys(item['id'] for item in reorder.items))
+        cursor = await db.execute(
+            f"SELECT id FROM nodes WHERE id IN ({','.join('?' * len(ids))})", ids
+        )
+        existing = {row['id'] for row in await cursor.fetchall()}
+        if not existing:
+            raise HTTPException(status_code=404, detail="Node not found")
+        await db.executemany(
+            "UPDATE nodes SET sort_order = ? WHERE id = ?",
+            [(item['sort_order'], item['id']) for item in reorder.items if item['id'] in existing]
+        )
+        await record_changes(db, ENTITY_NODE, [i for i in ids if i in existing], OP_UPSERT)
+    
+    await writer.submit(apply)
+    return {"success": True, "message": "Nodes reordered"}
 
 @router.put("/{node_id}", response_model=NodeResponse)
 async def update_node(node_id: int, node: NodeUpdate):
     """Update a node"""
-    db = await get_db()
-    try:
+    async def apply(db):
         # Check exists
         cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
         existing = await cursor.fetchone()
@@ -238,40 +315,45 @@ async def update_node(node_id: int, node: NodeUpdate):
                 f"UPDATE nodes SET {', '.join(updates)} WHERE id = ?",
                 values
             )
-            await db.commit()
+            await record_change(db, ENTITY_NODE, node_id, OP_UPSERT)
         
         cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
         row = await cursor.fetchone()
         return dict(row)
-    finally:
-        await db.close()
+    
+    return await writer.submit(apply)
 
 @router.delete("/{node_id}")
 async def delete_node(node_id: int):
     """Delete a node and its children"""
-    db = await get_db()
-    try:
-        cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
-        if not await cursor.fetchone():
+    async def apply(db):
+        deleted = await delete_subtree(db, node_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Node not found")
-        
-        await db.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
-        await db.commit()
-        return {"success": True, "message": "Node deleted"}
-    finally:
-        await db.close()
+        await record_changes(db, ENTITY_NODE, deleted, OP_DELETE)
+        return len(deleted)
+    
+    count = await writer.submit(apply)
+    return {"success": True, "message": "Node deleted", "deleted": count}
 
 @router.put("/{node_id}/move")
 async def move_node(node_id: int, move: NodeMove):
     """Move node to a new parent"""
-    db = await get_db()
-    try:
+    async def apply(db):
         # Check node exists
         cursor = await db.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
         node = await cursor.fetchone()
         if not node:
             raise HTTPException(status_code=404, detail="Node not found")
         
+        # A node can't move under itself or its own descendants
+        if move.new_parent_id is not None:
+            cursor = await db.execute(
+                f"{SUBTREE_CTE} SELECT 1 FROM subtree WHERE id = ?", (node_id, move.new_parent_id)
+            )
+            if await cursor.fetchone():
+                raise HTTPException(status_code=400, detail="Cannot move a node under itself or its descendants")
+        
         # Generate new code
         new_code = await generate_code(db, move.new_parent_id)
         
@@ -279,23 +361,8 @@ async def move_node(node_id: int, move: NodeMove):
             "UPDATE nodes SET parent_id = ?, code = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
             (move.new_parent_id, new_code, node_id)
         )
-        await db.commit()
-        
-        return {"success": True, "message": "Node moved", "new_code": new_code}
-    finally:
-        await db.close()
-
-@router.put("/reorder")
-async def reorder_nodes(reorder: NodeReorder):
-    """Batch reorder nodes"""
-    db = await get_db()
-    try:
-        for item in reorder.items:
-            await db.execute(
-                "UPDATE nodes SET sort_order = ? WHERE id = ?",
-                (item['sort_order'], item['id'])
-            )
-        await db.commit()
-        return {"success": True, "message": "Nodes reordered"}
-    finally:
-        await db.close()
+        await record_change(db, ENTITY_NODE, node_id, OP_UPSERT)
+        return new_code
+    
+    new_code = await writer.submit(apply)
+    return {"success": True, "message": "Node moved", "new_code": new_code}
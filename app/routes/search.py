@@ -2,14 +2,50 @@
 Search API Routes
 Global search across nodes
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Response
 from typing import List
+from pathlib import Path
+import os
+import shutil
+import string
 
 from ..database import get_db
+from ..writer import writer
+from ..singleflight import SingleFlight
+from ..cache import LRUCache
+from ..tenancy import tenant_local
+from ..serialize import NODE_COLUMNS, node_columns, fetch_nodes, encode
+from .. import fuzzy
+from ..hits import POPULARITY_SQL, fetch_popularity
+from ..changes import ENTITY_NODE, OP_UPSERT, OP_RESET, seen_version, record_changes
 from ..models import SearchResult
 
 router = APIRouter(prefix="/api", tags=["search"])
 
+ICON_DIR = Path(__file__).parent.parent.parent / "resource" / "icon"
+ICON_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.svg', '.webp', '.gif']
+
+# Coalesces concurrent identical searches
+flights = tenant_local(lambda: SingleFlight("search"))
+
+# Recent search results per portal, keyed by (normalized query, limit, data version)
+SEARCH_CACHE_ENTRIES = int(os.environ.get("TOOL_TABLE_SEARCH_CACHE_ENTRIES", "512"))
+SEARCH_CACHE_BYTES = int(os.environ.get("TOOL_TABLE_SEARCH_CACHE_BYTES", str(8 * 1024 * 1024)))
+SEARCH_CACHE_TTL = float(os.environ.get("TOOL_TABLE_SEARCH_CACHE_TTL", "300"))
+cache = tenant_local(lambda: LRUCache("search", SEARCH_CACHE_ENTRIES, SEARCH_CACHE_BYTES, SEARCH_CACHE_TTL))
+
+# SQLite's LIKE folds ASCII case only, so the cache key does the same
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def normalize_query(q: str) -> str:
+    """Cache key form of a query; queries with equal keys match the same rows"""
+    return q.translate(ASCII_LOWER)
+
+def invalidate_cache(changes: List[dict]):
+    """Listener: drop cached results once any node changes"""
+    if any(change['entity'] == ENTITY_NODE or change['op'] == OP_RESET for change in changes):
+        cache.clear()
+
 async def get_node_path(db, node_id: int) -> str:
     """Get full path of a node"""
     path_parts = []
@@ -29,44 +65,76 @@ async def get_node_path(db, node_id: int) -> str:
     return " > ".join(path_parts)
 
 @router.get("/search")
-async def search_nodes(q: str, limit: int = 50):
-    """Search nodes by name"""
+async def search_nodes(q: str, limit: int = 50,
+                       mode: str = Query("exact", pattern="^(exact|fuzzy)$"),
+                       sort: str = Query("default", pattern="^(default|popular)$")):
+    """Search nodes by name (mode=fuzzy also matches codes, typos and full-width forms;
+    sort=popular puts the most clicked first)"""
     if not q or len(q) < 1:
-        return []
-    
-    db = await get_db()
-    try:
-        cursor = await db.execute(
-            """SELECT * FROM nodes 
-               WHERE name LIKE ? AND is_active = TRUE 
-               ORDER BY node_type DESC, name 
-               LIMIT ?""",
-            (f"%{q}%", limit)
-        )
-        rows = await cursor.fetchall()
+        return Response(b"[]", media_type="application/json")
+    
+    if mode == "fuzzy":
+        async def load():
+            results = await fuzzy.search(q, limit)
+            if sort == "popular":
+                db = await get_db()
+                try:
+                    popularity = await fetch_popularity(db, [node['id'] for node in results])
+                finally:
+                    await db.close()
+                # Stable: equally close matches are reordered by clicks
+                results.sort(key=lambda node: (node['distance'], -popularity.get(node['id'], 0)))
+            return encode(results)
         
-        results = []
-        for row in rows:
-            node = dict(row)
-            node['path'] = await get_node_path(db, node['id'])
-            results.append(node)
+        key = (mode, sort, fuzzy.normalize(q), limit, seen_version())
+    else:
+        async def load():
+            db = await get_db()
+            try:
+                if sort == "popular":
+                    rows = await fetch_nodes(
+                        db,
+                        f"""SELECT {node_columns('n')} FROM nodes n LEFT JOIN {POPULARITY_SQL} h ON h.node_id = n.id
+                            WHERE n.name LIKE ? AND n.is_active = TRUE
+                            ORDER BY COALESCE(h.hits, 0) DESC, n.node_type DESC, n.name
+                            LIMIT ?""",
+                        (f"%{q}%", limit)
+                    )
+                else:
+                    rows = await fetch_nodes(
+                        db,
+                        f"""SELECT {NODE_COLUMNS} FROM nodes 
+                           WHERE name LIKE ? AND is_active = TRUE 
+                           ORDER BY node_type DESC, name 
+                           LIMIT ?""",
+                        (f"%{q}%", limit)
+                    )
+                
+                results = []
+                for row in rows:
+                    node = row.as_dict()
+                    node['path'] = await get_node_path(db, row.id)
+                    results.append(node)
+                
+                return encode(results)
+            finally:
+                await db.close()
         
-        return results
-    finally:
-        await db.close()
-
-@router.get("/icons")
-async def get_icons():
-    """Get list of available icons with metadata"""
-    import os
-    from pathlib import Path
+        key = (mode, sort, normalize_query(q), limit, seen_version())
     
-    icon_dir = Path(__file__).parent.parent.parent / "resource" / "icon"
+    body = cache.get(key)
+    if body is None:
+        body = await flights.do(key, load)
+        cache.put(key, body)
+    return Response(body, media_type="application/json")
+
+def list_icons() -> List[dict]:
+    """Get available icons with metadata, sorted by name"""
     icons = []
     
-    if icon_dir.exists():
-        for f in icon_dir.iterdir():
-            if f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.svg', '.webp', '.gif']:
+    if ICON_DIR.exists():
+        for f in ICON_DIR.iterdir():
+            if f.suffix.lower() in ICON_EXTENSIONS:
                 stat = f.stat()
                 icons.append({
                     "name": f.name,
@@ -76,22 +144,21 @@ async def get_icons():
     
     return sorted(icons, key=lambda x: x['name'])
 
+@router.get("/icons")
+async def get_icons():
+    """Get list of available icons with metadata"""
+    return list_icons()
+
 @router.post("/icons")
 async def upload_icon(file: UploadFile = File(...)):
     """Upload a new icon"""
-    from pathlib import Path
-    import shutil
-    
-    icon_dir = Path(__file__).parent.parent.parent / "resource" / "icon"
-    
     # Validate file type
-    allowed_extensions = ['.png', '.jpg', '.jpeg', '.svg', '.webp', '.gif']
     ext = Path(file.filename).suffix.lower()
-    if ext not in allowed_extensions:
-        raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}")
+    if ext not in ICON_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(ICON_EXTENSIONS)}")
     
     # Save file
-    dest = icon_dir / file.filename
+    dest = ICON_DIR / file.filename
     with dest.open("wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
@@ -100,10 +167,7 @@ async def upload_icon(file: UploadFile = File(...)):
 @router.delete("/icons/{filename}")
 async def delete_icon(filename: str):
     """Delete an icon"""
-    from pathlib import Path
-    
-    icon_dir = Path(__file__).parent.parent.parent / "resource" / "icon"
-    icon_path = icon_dir / filename
+    icon_path = ICON_DIR / filename
     
     if not icon_path.exists():
         raise HTTPException(status_code=404, detail="Icon not found")
@@ -124,11 +188,8 @@ async def delete_icon(filename: str):
 @router.put("/icons/{filename}")
 async def rename_icon(filename: str, new_name: str):
     """Rename an icon"""
-    from pathlib import Path
-    
-    icon_dir = Path(__file__).parent.parent.parent / "resource" / "icon"
-    old_path = icon_dir / filename
-    new_path = icon_dir / new_name
+    old_path = ICON_DIR / filename
+    new_path = ICON_DIR / new_name
     
     if not old_path.exists():
         raise HTTPException(status_code=404, detail="Icon not found")
@@ -137,20 +198,20 @@ async def rename_icon(filename: str, new_name: str):
         raise HTTPException(status_code=400, detail="Icon with this name already exists")
     
     # Validate extension
-    allowed_extensions = ['.png', '.jpg', '.jpeg', '.svg', '.webp', '.gif']
-    if Path(new_name).suffix.lower() not in allowed_extensions:
+    if Path(new_name).suffix.lower() not in ICON_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Invalid file extension")
     
     # Rename file
     old_path.rename(new_path)
     
     # Update references in database
-    db = await get_db()
-    try:
+    async def apply(db):
+        cursor = await db.execute("SELECT id FROM nodes WHERE icon = ?", (filename,))
+        node_ids = [row['id'] for row in await cursor.fetchall()]
         await db.execute("UPDATE nodes SET icon = ? WHERE icon = ?", (new_name, filename))
-        await db.commit()
-    finally:
-        await db.close()
+        await record_changes(db, ENTITY_NODE, node_ids, OP_UPSERT)
+    
+    await writer.submit(apply)
     
     return {"message": "Icon renamed", "old_name": filename, "new_name": new_name}
 
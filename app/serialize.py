@@ -0,0 +1,111 @@
+"""
+Lean Serialization for Tool Table
+Typed row objects built on the database thread and encoded straight to JSON
+
+List endpoints return thousands of rows whose shape the database already
+guarantees, so validating each through a Pydantic model only costs time.
+The rows here produce the same JSON as NodeResponse / AuthLinkResponse:
+same key order, booleans for is_active and ISO timestamps with 'T'.
+"""
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+_datetime = TypeAdapter(datetime)
+
+def timestamp(value: Any) -> Optional[str]:
+    """A SQLite timestamp as Pydantic renders the parsed datetime"""
+    if value is None:
+        return None
+    if isinstance(value, str) and len(value) == 19 and value[10] == " ":
+        # CURRENT_TIMESTAMP form, by far the common case
+        return f"{value[:10]}T{value[11:]}"
+    return _datetime.dump_python(_datetime.validate_python(value), mode="json")
+
+def node_columns(alias: str) -> str:
+    """Columns for NodeRow queries, qualified with the nodes table alias"""
+    return (
+        f"{alias}.id, {alias}.parent_id, {alias}.code, {alias}.name, {alias}.node_type, "
+        f"{alias}.icon, {alias}.url, {alias}.sort_order, {alias}.is_active, "
+        f"{alias}.created_at, {alias}.updated_at, "
+        f"(SELECT status FROM link_status WHERE entity = 'node' AND entity_id = {alias}.id)"
+    )
+
+# Column list for `SELECT ... FROM nodes` queries whose rows become NodeRow
+NODE_COLUMNS = node_columns("nodes")
+
+class NodeRow:
+    """One nodes row; usable directly as a sqlite3 row_factory"""
+    __slots__ = ("id", "parent_id", "code", "name", "node_type", "icon", "url",
+                 "sort_order", "is_active", "created_at", "updated_at", "link_status")
+
+    def __init__(self, cursor, row):
+        (self.id, self.parent_id, self.code, self.name, self.node_type, self.icon,
+         self.url, sort_order, is_active, created_at, updated_at, self.link_status) = row
+        self.sort_order = int(sort_order) if sort_order is not None else 0
+        self.is_active = bool(is_active)
+        self.created_at = timestamp(created_at)
+        self.updated_at = timestamp(updated_at)
+
+    def as_dict(self) -> dict:
+        """Fields in NodeResponse order"""
+        return {
+            "name": self.name,
+            "node_type": self.node_type,
+            "icon": self.icon,
+            "url": self.url,
+            "sort_order": self.sort_order,
+            "is_active": self.is_active,
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "code": self.code,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "link_status": self.link_status,
+        }
+
+# Column order for queries whose rows become AuthLinkRow
+AUTH_LINK_COLUMNS = "id, region, name, url, sort_order, is_active, created_at"
+
+class AuthLinkRow:
+    """One auth_links row; usable directly as a sqlite3 row_factory"""
+    __slots__ = ("id", "region", "name", "url", "sort_order", "is_active", "created_at")
+
+    def __init__(self, cursor, row):
+        (self.id, self.region, self.name, self.url, sort_order, is_active, created_at) = row
+        self.sort_order = int(sort_order) if sort_order is not None else 0
+        self.is_active = bool(is_active)
+        self.created_at = timestamp(created_at)
+
+    def as_dict(self) -> dict:
+        """Fields in AuthLinkResponse order"""
+        return {
+            "region": self.region,
+            "name": self.name,
+            "url": self.url,
+            "sort_order": self.sort_order,
+            "is_active": self.is_active,
+            "id": self.id,
+            "created_at": self.created_at,
+        }
+
+async def fetch_rows(db, row_type, sql: str, parameters=()) -> List[Any]:
+    """Run a query and build typed rows on the database thread"""
+    cursor = await db.execute(sql, parameters)
+    cursor.row_factory = row_type
+    return await cursor.fetchall()
+
+async def fetch_nodes(db, sql: str, parameters=()) -> List[NodeRow]:
+    """Run a query selecting NODE_COLUMNS and return NodeRow objects"""
+    return await fetch_rows(db, NodeRow, sql, parameters)
+
+def encode(data: Any) -> bytes:
+    """JSON bytes, formatted like FastAPI's JSONResponse"""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def json_response(data: Any, headers: Optional[dict] = None) -> Response:
+    """Return already-shaped data without response_model validation"""
+    return Response(encode(data), media_type="application/json", headers=headers)
@@ -0,0 +1,45 @@
+"""
+Request Coalescing for Tool Table
+Concurrent identical reads await one in-flight computation and share its result
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from . import metrics
+
+class SingleFlight:
+    """Deduplicate concurrent calls by key
+
+    Keys should include the data version the caller expects, so a request
+    arriving after a commit never joins a computation that started before it.
+    Results are shared objects and must be treated as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        metrics.register(f"singleflight.{name}", self.stats)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` once for all concurrent callers with the same key"""
+        self.calls += 1
+        task = self.inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # Shield so one caller disconnecting doesn't cancel the others' work
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        shared = self.calls - self.executions
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": shared,
+            "dedup_ratio": round(shared / self.calls, 4) if self.calls else 0.0,
+            "inflight": len(self.inflight),
+        }
@@ -0,0 +1,202 @@
+"""
+Static Snapshot Generator for Tool Table
+Renders the read API into static JSON files a plain web server can serve
+
+Usage: python -m app.snapshot [--out DIR] [--full]
+
+Layout (same shapes as the API responses):
+    bootstrap.json        /api/bootstrap
+    auth-links.json       /api/auth-links
+    nodes/{code}.json     /api/nodes/code/{code}
+    search-index.json     every active node with its path, for client-side search
+    manifest.json         data version and content hash of every file
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import database, tenancy
+from .changes import get_version, add_listener
+from .routes.auth_links import fetch_auth_link_groups
+from .lifecycle import add_warmup
+from .serialize import NODE_COLUMNS, fetch_nodes, encode
+from .routes.bootstrap import icons_mtime
+from .routes.search import list_icons
+
+# Output directory (override with TOOL_TABLE_SNAPSHOT_DIR); when the variable
+# is set the server also regenerates the snapshot after every commit. Other
+# portals than the default write to tenants/<name> in it
+SNAPSHOT_DIR = Path(os.environ.get("TOOL_TABLE_SNAPSHOT_DIR", database.DB_DIR / "snapshot"))
+AUTO_SNAPSHOT = "TOOL_TABLE_SNAPSHOT_DIR" in os.environ
+
+# Seconds to wait after a commit so bursts of edits regenerate once
+DEBOUNCE = 1.0
+
+# Codes usable as file names (explicit codes are free text)
+SAFE_CODE = re.compile(r"[\w-][\w.-]*")
+
+async def render(db) -> Dict[str, bytes]:
+    """Render every snapshot file from one consistent read"""
+    await db.execute("BEGIN")
+    try:
+        version = await get_version(db)
+        nodes = [row.as_dict() for row in await fetch_nodes(
+            db, f"SELECT {NODE_COLUMNS} FROM nodes WHERE is_active = TRUE ORDER BY sort_order, code"
+        )]
+        cursor = await db.execute("SELECT id, parent_id, name FROM nodes")
+        names = {row['id']: (row['parent_id'], row['name']) for row in await cursor.fetchall()}
+        auth_links = await fetch_auth_link_groups(db)
+    finally:
+        await db.rollback()
+
+    children: Dict[Optional[int], List[dict]] = {}
+    for node in nodes:
+        children.setdefault(node['parent_id'], []).append(node)
+
+    def path_of(node_id: int) -> str:
+        parts = []
+        seen = set()
+        while node_id in names and node_id not in seen:
+            seen.add(node_id)
+            parent_id, name = names[node_id]
+            parts.append(name)
+            node_id = parent_id
+        return " > ".join(reversed(parts))
+
+    files = {"manifest.json": b""}  # Placeholder, written last
+    for node in nodes:
+        if not SAFE_CODE.fullmatch(node['code']):
+            continue
+        files[f"nodes/{node['code']}.json"] = encode(
+            {**node, "items": children.get(node['id'], [])}
+        )
+
+    files["search-index.json"] = encode({
+        "version": version,
+        "items": [
+            {
+                "id": node['id'], "name": node['name'], "node_type": node['node_type'],
+                "icon": node['icon'], "url": node['url'], "code": node['code'],
+                "path": path_of(node['id']),
+            }
+            for node in sorted(nodes, key=lambda n: (n['node_type'] != 'link', n['name']))
+        ],
+    })
+    files["auth-links.json"] = encode(auth_links)
+
+    roots = children.get(None, [])
+    files["bootstrap.json"] = encode({
+        "version": version,
+        "roots": roots,
+        "children": {str(root['id']): children.get(root['id'], []) for root in roots},
+        "auth_links": auth_links,
+        "icons": list_icons(),
+    })
+
+    files["manifest.json"] = encode({
+        "version": version,
+        "icons_mtime": icons_mtime(),
+        "files": {
+            name: hashlib.sha1(body).hexdigest()
+            for name, body in files.items() if name != "manifest.json"
+        },
+    })
+    return files
+
+def load_manifest(out_dir: Path) -> dict:
+    try:
+        return json.loads((out_dir / "manifest.json").read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+def write_atomic(path: Path, body: bytes):
+    """Replace a file so readers never see a partial write"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(body)
+    os.replace(tmp, path)
+
+async def generate(out_dir: Optional[Path] = None, full: bool = False) -> dict:
+    """Regenerate the snapshot, writing only files whose content changed"""
+    out_dir = out_dir or tenancy.current().subdir(SNAPSHOT_DIR)
+    db = await database.get_db()
+    try:
+        if not full:
+            manifest = load_manifest(out_dir)
+            if (manifest.get("version") == await get_version(db)
+                    and manifest.get("icons_mtime") == icons_mtime()):
+                return {"version": manifest["version"], "written": 0, "removed": 0}
+        files = await render(db)
+    finally:
+        await db.close()
+
+    old_hashes = {} if full else load_manifest(out_dir).get("files", {})
+    new_manifest = json.loads(files["manifest.json"])
+    new_hashes = new_manifest["files"]
+
+    written = 0
+    for name, digest in new_hashes.items():
+        if old_hashes.get(name) != digest or not (out_dir / name).exists():
+            write_atomic(out_dir / name, files[name])
+            written += 1
+
+    removed = 0
+    for name in set(old_hashes) - set(new_hashes):
+        try:
+            (out_dir / name).unlink()
+            removed += 1
+        except OSError:
+            pass
+
+    # Manifest last, so an interrupted run is redone next time
+    write_atomic(out_dir / "manifest.json", files["manifest.json"])
+    return {"version": new_manifest["version"], "written": written, "removed": removed}
+
+class SnapshotHook:
+    """Regenerate the snapshot shortly after commits (post-commit hook)"""
+
+    def __init__(self, out_dir: Optional[Path] = None, debounce: float = DEBOUNCE):
+        self.out_dir = out_dir
+        self.debounce = debounce
+        self.task: Optional[asyncio.Task] = None
+        self.dirty = False
+
+    def __call__(self, changes: List[dict]):
+        self.dirty = True
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        # Commits landing while a run is in progress trigger one more run
+        while self.dirty:
+            self.dirty = False
+            await asyncio.sleep(self.debounce)
+            try:
+                await generate(self.out_dir)
+            except Exception as e:
+                print(f"Snapshot regeneration failed: {e}")
+
+def install_hook():
+    """Enable post-commit regeneration when TOOL_TABLE_SNAPSHOT_DIR is set"""
+    if AUTO_SNAPSHOT:
+        add_listener(SnapshotHook())
+        add_warmup(generate)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.snapshot",
+                                     description="Render the portal data into static JSON files")
+    parser.add_argument("--out", type=Path, default=SNAPSHOT_DIR, help=f"output directory (default: {SNAPSHOT_DIR})")
+    parser.add_argument("--full", action="store_true", help="rewrite every file")
+    args = parser.parse_args()
+
+    result = asyncio.run(generate(args.out, full=args.full))
+    print(f"Snapshot v{result['version']} at {args.out}: "
+          f"{result['written']} file(s) written, {result['removed']} removed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Multi-Portal Hosting for Tool Table
+Routes each request to a tenant (one SQLite file per portal) and keeps the
+stateful components of recently used tenants open
+
+A request belongs to a tenant when:
+  - its Host is mapped in TOOL_TABLE_TENANT_HOSTS (`host=name,...`), or is
+    `<name>.<TOOL_TABLE_TENANT_DOMAIN>`, or
+  - its path starts with `/t/<name>/` (the prefix is stripped), or
+  - it is an `/api/` call from a page under `/t/<name>/` (Referer), so the
+    portal pages work unchanged under a prefix.
+Anything else is served by the default portal (TOOL_TABLE_DB), exactly as
+a single-portal deployment.
+
+Module-level components (writer, watcher, caches...) are declared with
+`tenant_local(factory)`: each tenant gets its own instance, created on
+first use while that tenant is current. Tenants other than the default are
+opened on first request and closed again when idle or when more than
+TOOL_TABLE_MAX_TENANTS are open, least recently used first, which bounds
+memory, connections and file handles.
+
+Usage: python -m app.tenancy [--list] [NAME ...]   (create tenant databases)
+"""
+import argparse
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_TENANT = "default"
+
+# Path prefix selecting a tenant (`/t/<name>/...`); empty disables it
+TENANT_PREFIX = os.environ.get("TOOL_TABLE_TENANT_PREFIX", "/t").rstrip("/")
+
+# Explicit host routing: "portal-a.example.com=a,portal-b.example.com=b"
+TENANT_HOSTS = dict(
+    item.strip().lower().split("=", 1)
+    for item in os.environ.get("TOOL_TABLE_TENANT_HOSTS", "").split(",") if "=" in item
+)
+
+# Subdomain routing: <name>.<domain>
+TENANT_DOMAIN = os.environ.get("TOOL_TABLE_TENANT_DOMAIN", "").lower().strip(".")
+
+# Tenants open at once (besides the default), and seconds before an idle one closes
+MAX_OPEN = int(os.environ.get("TOOL_TABLE_MAX_TENANTS", "16"))
+IDLE_TIMEOUT = float(os.environ.get("TOOL_TABLE_TENANT_IDLE", "300"))
+
+# Tenant names double as file names
+TENANT_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,62}")
+
+class Tenant:
+    """One portal: its database file and its component instances"""
+
+    def __init__(self, name: str, db_path: Path):
+        self.name = name
+        self.db_path = Path(db_path)
+        self.state: Dict[Callable[[], Any], Any] = {}
+        self.active = 0
+        self.last_used = time.monotonic()
+        self.opening: Optional[asyncio.Future] = None
+
+    @property
+    def is_default(self) -> bool:
+        return self.name == DEFAULT_TENANT
+
+    def subdir(self, base: Path) -> Path:
+        """Per-tenant location under a configured directory (backups, snapshots)"""
+        return base if self.is_default else base / "tenants" / self.name
+
+    def local(self, factory: Callable[[], Any]) -> Any:
+        """This tenant's instance of a component, created on first use"""
+        try:
+            return self.state[factory]
+        except KeyError:
+            pass
+        token = _current.set(self)
+        try:
+            instance = self.state[factory] = factory()
+        finally:
+            _current.reset(token)
+        return instance
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()` with this tenant current (tasks it starts inherit it)"""
+        token = _current.set(self)
+        try:
+            return await fn()
+        finally:
+            _current.reset(token)
+
+_current: ContextVar[Tenant] = ContextVar("tool_table_tenant")
+_default: Optional[Tenant] = None
+
+def default_tenant() -> Tenant:
+    global _default
+    if _default is None:
+        from .database import DB_PATH
+        _default = Tenant(DEFAULT_TENANT, DB_PATH)
+    return _default
+
+def current() -> Tenant:
+    """The tenant being served (the default one outside requests)"""
+    try:
+        return _current.get()
+    except LookupError:
+        return default_tenant()
+
+class TenantLocal:
+    """Proxy to the current tenant's instance of a component"""
+    __slots__ = ("_factory",)
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, "_factory", factory)
+
+    def _instance(self) -> Any:
+        return current().local(self._factory)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._instance(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._instance(), name, value)
+
+    # Special methods are looked up on the type, so forward the ones used
+    async def __aenter__(self):
+        return await self._instance().__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        return await self._instance().__aexit__(*exc_info)
+
+def tenant_local(factory: Callable[[], Any]) -> Any:
+    """Declare a component that each tenant gets its own instance of"""
+    return TenantLocal(factory)
+
+def tenants_dir() -> Path:
+    from .database import DB_DIR
+    return Path(os.environ.get("TOOL_TABLE_TENANTS_DIR", DB_DIR / "tenants"))
+
+def tenant_path(name: str) -> Path:
+    return tenants_dir() / f"{name}.db"
+
+class TenantRegistry:
+    """Open tenants on demand; close idle ones, least recently used first"""
+
+    def __init__(self, max_open: int = MAX_OPEN, idle_timeout: float = IDLE_TIMEOUT):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self.closing: Dict[str, asyncio.Task] = {}
+        self.on_open: Optional[Callable[[], Awaitable[None]]] = None
+        self.on_close: Optional[Callable[[], Awaitable[None]]] = None
+        self.task: Optional[asyncio.Task] = None
+        self.opened = 0
+        self.evicted = 0
+
+    def exists(self, name: str) -> bool:
+        """Mapped hosts are created on first use; other names must exist on disk"""
+        if name == DEFAULT_TENANT:
+            return False
+        return name in TENANT_HOSTS.values() or tenant_path(name).exists()
+
+    async def start(self, on_open: Callable[[], Awaitable[None]],
+                    on_close: Callable[[], Awaitable[None]]):
+        """Open the default tenant and start closing idle ones"""
+        self.on_open, self.on_close = on_open, on_close
+        await default_tenant().run(on_open)
+        self.task = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        """Close every tenant, the default one last"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        while self.tenants:
+            self._close(self.tenants.popitem(last=False)[1])
+        if self.closing:
+            await asyncio.gather(*self.closing.values(), return_exceptions=True)
+        await default_tenant().run(self.on_close)
+
+    async def acquire(self, name: str) -> Tenant:
+        """Get an open tenant for a request; pair with `release`"""
+        tenant = self.tenants.get(name)
+        if tenant is None:
+            if not self.exists(name):
+                raise LookupError(name)
+            if name in self.closing:
+                # Let the previous instance release its connections first
+                await asyncio.shield(self.closing[name])
+            tenant = self.tenants.get(name)
+            if tenant is None:
+                tenant = self.tenants[name] = Tenant(name, tenant_path(name))
+                tenant.opening = asyncio.ensure_future(self._open(tenant))
+        self.tenants.move_to_end(name)
+        tenant.active += 1
+        try:
+            await asyncio.shield(tenant.opening)
+        except Exception:
+            tenant.active -= 1
+            if self.tenants.get(name) is tenant:
+                del self.tenants[name]
+            raise
+        self._evict()
+        return tenant
+
+    def release(self, tenant: Tenant):
+        tenant.active -= 1
+        tenant.last_used = time.monotonic()
+
+    async def _open(self, tenant: Tenant):
+        from .lifecycle import run_warmups
+
+        tenant.db_path.parent.mkdir(parents=True, exist_ok=True)
+        await tenant.run(self.on_open)
+        await tenant.run(run_warmups)
+        self.opened += 1
+
+    def _close(self, tenant: Tenant):
+        async def close():
+            try:
+                await tenant.opening
+                await tenant.run(self.on_close)
+            except Exception as e:
+                print(f"Closing tenant {tenant.name} failed: {e}")
+            finally:
+                self.closing.pop(tenant.name, None)
+
+        self.closing[tenant.name] = asyncio.ensure_future(close())
+
+    def _evict(self):
+        """Close least recently used idle tenants while over the limit"""
+        excess = len(self.tenants) - self.max_open
+        for tenant in list(self.tenants.values()):
+            if excess <= 0:
+                break
+            if tenant.active == 0:
+                del self.tenants[tenant.name]
+                self._close(tenant)
+                self.evicted += 1
+                excess -= 1
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            for tenant in list(self.tenants.values()):
+                if tenant.active == 0 and tenant.last_used < cutoff:
+                    del self.tenants[tenant.name]
+                    self._close(tenant)
+                    self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "open": len(self.tenants),
+            "max_open": self.max_open,
+            "opened": self.opened,
+            "evicted": self.evicted,
+            "active": {name: t.active for name, t in self.tenants.items()},
+        }
+
+# Process-wide registry
+registry = TenantRegistry()
+
+def _header(scope, key: bytes) -> str:
+    for name, value in scope["headers"]:
+        if name == key:
+            return value.decode("latin-1")
+    return ""
+
+def _prefixed(path: str) -> Optional[Tuple[str, str]]:
+    """Split `/t/<name>/...` into the name and the `/t/<name>` prefix"""
+    if not TENANT_PREFIX or not path.startswith(TENANT_PREFIX + "/"):
+        return None
+    name = path[len(TENANT_PREFIX) + 1:].split("/", 1)[0]
+    return name, f"{TENANT_PREFIX}/{name}"
+
+def route_path(scope, path: Optional[str] = None) -> str:
+    """A path without the root path the app is mounted at"""
+    path = scope["path"] if path is None else path
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path + "/"):
+        return path[len(root_path):]
+    return path
+
+def resolve(scope) -> Tuple[Optional[str], str]:
+    """Tenant name for a request (None for the default) and its path prefix"""
+    path = route_path(scope)
+    prefixed = _prefixed(path)
+    if prefixed:
+        return prefixed
+
+    host = _header(scope, b"host").lower().rsplit(":", 1)[0]
+    if host in TENANT_HOSTS:
+        return TENANT_HOSTS[host], ""
+    if TENANT_DOMAIN and host.endswith("." + TENANT_DOMAIN):
+        return host[:-len(TENANT_DOMAIN) - 1], ""
+
+    if path.startswith("/api/"):
+        referer = _header(scope, b"referer")
+        if referer:
+            prefixed = _prefixed(route_path(scope, urlsplit(referer).path))
+            if prefixed:
+                return prefixed[0], ""
+    return None, ""
+
+class TenantMiddleware:
+    """ASGI middleware making the request's tenant current"""
+
+    def __init__(self, app, registry: TenantRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name, prefix = resolve(scope)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        if not TENANT_NAME.fullmatch(name):
+            await _respond(send, 404, b'{"detail":"Portal not found"}')
+            return
+        if prefix:
+            if route_path(scope) == prefix:
+                # Relative asset URLs need the trailing slash
+                await _respond(send, 307, b"", [(b"location", f"{scope['path']}/".encode())])
+                return
+            # Routing sees the rest of the path, as for a mounted app
+            scope = {**scope, "root_path": scope.get("root_path", "") + prefix}
+
+        try:
+            tenant = await self.registry.acquire(name)
+        except LookupError:
+            await _respond(send, 404, b'{"detail":"Portal not found"}')
+            return
+        token = _current.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            self.registry.release(tenant)
+
+async def _respond(send, status: int, body: bytes, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def create(name: str) -> Path:
+    """Create (or upgrade) a tenant's database"""
+    from .database import init_db
+
+    tenant = Tenant(name, tenant_path(name))
+    tenant.db_path.parent.mkdir(parents=True, exist_ok=True)
+    await tenant.run(init_db)
+    return tenant.db_path
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.tenancy",
+                                     description="Create portal databases for multi-portal hosting")
+    parser.add_argument("names", nargs="*", metavar="NAME", help="tenants to create (or upgrade)")
+    parser.add_argument("--list", action="store_true", help="list tenant databases")
+    args = parser.parse_args()
+
+    # Run as __main__, this file is a second copy of the module; the
+    # database module reads the current tenant from the package's copy
+    from .tenancy import TENANT_NAME, create, tenants_dir
+
+    for name in args.names:
+        if not TENANT_NAME.fullmatch(name) or name == DEFAULT_TENANT:
+            parser.error(f"invalid tenant name: {name}")
+        asyncio.run(create(name))
+    if args.list or not args.names:
+        for path in sorted(tenants_dir().glob("*.db")):
+            print(f"{path.stem}  {path.stat().st_size / 1024:.0f} KiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Single Writer for Tool Table
+Funnels all mutations through one connection and groups them into shared commits
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import aiosqlite
+
+from . import database
+from .changes import commit, rollback, pending_mark, discard_pending
+from .tenancy import tenant_local
+
+# Jobs waiting for the writer before submitters are made to wait
+WRITE_QUEUE_SIZE = int(os.environ.get("TOOL_TABLE_WRITE_QUEUE_SIZE", "1000"))
+
+# Seconds the writer waits for more jobs to join a batch
+GROUP_COMMIT_WINDOW = float(os.environ.get("TOOL_TABLE_GROUP_COMMIT_WINDOW", "0.002"))
+
+# Most jobs committed together
+MAX_BATCH = 64
+
+Job = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+class Writer:
+    """Run write jobs one at a time on a dedicated connection
+
+    Jobs arriving within the group-commit window share one transaction and
+    one commit. Each job runs inside its own savepoint, so a job that raises
+    (e.g. HTTPException for a missing row) is rolled back alone and its
+    caller gets the exception while the rest of the batch still commits.
+    Jobs must not commit themselves.
+    """
+
+    def __init__(self, queue_size: int = WRITE_QUEUE_SIZE,
+                 window: float = GROUP_COMMIT_WINDOW, max_batch: int = MAX_BATCH):
+        self.queue_size = queue_size
+        self.window = window
+        self.max_batch = max_batch
+        self.queue: Optional[asyncio.Queue] = None
+        self.db: Optional[aiosqlite.Connection] = None
+        self.task: Optional[asyncio.Task] = None
+        self.jobs = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        """Open the writer connection and start the writer task"""
+        self.db = await database.get_db()
+        await self.db.execute("PRAGMA synchronous = NORMAL")
+        self.queue = asyncio.Queue(self.queue_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Finish queued jobs, then stop the task and close the connection"""
+        if self.running:
+            await self.queue.put(None)
+            await self.task
+        self.task = None
+        if self.db:
+            await self.db.close()
+            self.db = None
+
+    async def submit(self, job: Job) -> Any:
+        """Run a write job and return its result once committed"""
+        if not self.running:
+            # No writer task (scripts, CLI tools): run on a fresh connection
+            db = await database.get_db()
+            try:
+                result = await job(db)
+                await commit(db)
+                return result
+            finally:
+                await db.close()
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((job, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = asyncio.get_running_loop().time() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._execute(batch)
+
+    async def _execute(self, batch: List[Tuple[Job, asyncio.Future]]):
+        db = self.db
+        done = []
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                if future.cancelled():
+                    continue
+                mark = pending_mark(db)
+                await db.execute("SAVEPOINT job")
+                try:
+                    result = await job(db)
+                except Exception as e:
+                    await db.execute("ROLLBACK TO job")
+                    await db.execute("RELEASE job")
+                    discard_pending(db, mark)
+                    future.set_exception(e)
+                    continue
+                await db.execute("RELEASE job")
+                done.append((future, result))
+            await commit(db)
+        except Exception as e:
+            # The batch as a whole failed (lock timeout, disk error...)
+            try:
+                await rollback(db)
+            except Exception:
+                pass
+            for future, _ in done:
+                if not future.done():
+                    future.set_exception(e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.batches += 1
+            self.jobs += len(batch)
+
+        for future, result in done:
+            if not future.done():
+                future.set_result(result)
+
+# One writer per tenant database
+writer = tenant_local(Writer)
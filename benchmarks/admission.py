@@ -0,0 +1,94 @@
+"""
+Admission Control Benchmark
+Fires a burst of concurrent uncached searches at the app, first with the
+read limit disabled and then enabled, and reports latency of served
+requests, how many were shed with 503 (and how fast), and the peak number
+of threads, which tracks open database connections.
+
+Usage: python benchmarks/admission.py [--burst 400] [--max-reads 16] [--queue 64]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+async def burst(client, size: int, tag: str):
+    """Send `size` distinct searches at once; return (ok ms, shed ms, peak threads)"""
+    peak = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    async def one(i: int):
+        start = time.perf_counter()
+        response = await client.get("/api/search", params={"q": f"主機 {tag}{i}"})
+        assert response.status_code in (200, 503), response.text
+        if response.status_code == 503:
+            assert response.headers["retry-after"]
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    sampler = asyncio.create_task(sample())
+    results = await asyncio.gather(*(one(i) for i in range(size)))
+    done.set()
+    await sampler
+    ok = [ms for status, ms in results if status == 200]
+    shed = [ms for status, ms in results if status == 503]
+    return ok, shed, peak
+
+async def run(args):
+    import httpx
+    from app import admission
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for label, limit in (("unlimited", 0), ("admission", args.max_reads)):
+                admission.reads.limit = limit
+                admission.reads.queue_size = args.queue
+                admission.reads.timeout = args.timeout
+                ok, shed, peak = await burst(client, args.burst, label)
+                print(f"  {label:>9}: {len(ok)} served  p50 {statistics.median(ok):7.1f} ms  "
+                      f"p99 {percentile(ok, 0.99):7.1f} ms  peak threads {peak}")
+                if shed:
+                    print(f"  {'':>9}  {len(shed)} shed    p50 {statistics.median(shed):7.1f} ms")
+            print(f"  gate: {admission.reads.stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=400, help="concurrent requests")
+    parser.add_argument("--max-reads", type=int, default=16)
+    parser.add_argument("--queue", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds a request may queue")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TOOL_TABLE_DB"] = str(Path(tmp) / "bench.db")
+        sys.path.insert(0, str(PROJECT_ROOT))
+        sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+        from app.database import init_db
+        from search_cache import populate
+
+        asyncio.run(init_db())
+        print(f"Populated {populate(os.environ['TOOL_TABLE_DB'], args.nodes)} nodes, "
+              f"burst of {args.burst} concurrent searches")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Startup Benchmark
+Starts the production server (`python -m app`) against a temporary database
+and times how long it takes from process start until /api/ready answers 200:
+once on a new database (schema created) and then over repeated restarts
+(schema current), which is what restarts and worker scale-up pay.
+
+Usage: python benchmarks/bench_startup.py [--restarts 5] [--workers 1] [--nodes 20000]
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def ready(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+def start_once(env: dict, workers: int, timeout: float) -> float:
+    """Start the server, return seconds until ready, then stop it"""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not ready(port):
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("server not ready in time")
+            time.sleep(0.01)
+        return time.perf_counter() - started
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--restarts", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--nodes", type=int, default=20000, help="nodes added after the first start")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        env = dict(os.environ, TOOL_TABLE_DB=str(db_path))
+        print(f"Starting `python -m app --workers {args.workers}` until /api/ready")
+
+        first = start_once(env, args.workers, args.timeout)
+        print(f"  new database: {first * 1000:7.0f} ms")
+
+        if args.nodes:
+            sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+            from search_cache import populate
+            print(f"  (populated {populate(str(db_path), args.nodes)} nodes)")
+
+        samples = [start_once(env, args.workers, args.timeout) for _ in range(args.restarts)]
+        print(f"      restart: {statistics.median(samples) * 1000:7.0f} ms median "
+              f"(min {min(samples) * 1000:.0f}, max {max(samples) * 1000:.0f}, {len(samples)} runs)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cross-Worker Coherence Benchmark
+Runs several uvicorn workers against one SQLite file, writes through one
+worker and measures how long the others take to push each change over SSE.
+
+Usage: python benchmarks/coherence_latency.py [--workers 3] [--writes 20]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+BASE_PORT = 18300
+
+def wait_ready(port: int, timeout: float = 15.0):
+    """Wait until a worker answers /api/health"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+def listen(port: int, received: dict, ready: threading.Event):
+    """Record arrival time of every change event pushed by one worker"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/api/events")
+    response = conn.getresponse()
+    ready.set()
+    while True:
+        line = response.fp.readline()
+        if not line:
+            return
+        if line.startswith(b"data: "):
+            data = json.loads(line[6:])
+            if data.get("id") is not None:
+                received.setdefault(data["id"], time.perf_counter())
+
+def create_node(port: int, name: str) -> int:
+    """Create a root folder through one worker and return its id"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = json.dumps({"name": name, "code": name, "node_type": "folder"})
+    conn.request("POST", "/api/nodes", body, {"Content-Type": "application/json"})
+    return json.loads(conn.getresponse().read())["id"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--writes", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.1,
+                        help="coherence poll interval in seconds")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ,
+               TOOL_TABLE_DB=os.path.join(tmp, "bench.db"),
+               TOOL_TABLE_COHERENCE_INTERVAL=str(args.interval))
+    ports = [BASE_PORT + i for i in range(args.workers)]
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(port), "--log-level", "warning"],
+            cwd=PROJECT_ROOT, env=env
+        )
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            wait_ready(port)
+
+        # Listen on every worker except the writer
+        listeners = {}
+        for port in ports[1:]:
+            received, ready = {}, threading.Event()
+            threading.Thread(target=listen, args=(port, received, ready),
+                             daemon=True).start()
+            ready.wait(5)
+            listeners[port] = received
+
+        sent = {}
+        for i in range(args.writes):
+            start = time.perf_counter()
+            node_id = create_node(ports[0], f"bench-{i}")
+            sent[node_id] = start
+            time.sleep(args.interval / 2)
+
+        time.sleep(args.interval * 4)
+        missing = 0
+        for port, received in listeners.items():
+            latencies = [
+                (received[node_id] - start) * 1000
+                for node_id, start in sent.items() if node_id in received
+            ]
+            missing += len(sent) - len(latencies)
+            if not latencies:
+                print(f"worker :{port}  received 0/{len(sent)}")
+                continue
+            print(f"worker :{port}  received {len(latencies)}/{len(sent)}  "
+                  f"p50 {statistics.median(latencies):.1f} ms  "
+                  f"max {max(latencies):.1f} ms")
+        if missing:
+            print(f"FAIL: {missing} change(s) never reached a worker")
+            sys.exit(1)
+        print("OK: all workers observed every change")
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                # Open SSE streams keep uvicorn's graceful shutdown waiting
+                proc.kill()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Fuzzy Search Benchmark
+Builds the n-gram index over a synthetic tree and times mode=fuzzy queries
+(exact, typo and full-width spellings) with the result cache cleared.
+
+Usage: python benchmarks/fuzzy_search.py [--nodes 100000] [--rounds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from search_cache import PROJECT_ROOT, populate
+
+QUERIES = ["台北", "ssh", "sshh", "ｊｕｍｐ", "監控主機", "備分", "1-2-3", "h123.example"]
+
+async def run(rounds: int):
+    from app import fuzzy
+    from app.routes import search
+
+    start = time.perf_counter()
+    db = await fuzzy.database.get_db()
+    try:
+        await fuzzy.index.refresh(db)
+    finally:
+        await db.close()
+    print(f"index build: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{len(fuzzy.index.postings)} grams")
+
+    for q in QUERIES:
+        samples = []
+        for _ in range(rounds):
+            search.cache.clear()
+            start = time.perf_counter()
+            response = await search.search_nodes(q=q, limit=50, mode="fuzzy")
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        results = json.loads(response.body)
+        top = results[0]['name'] if results else "-"
+        print(f"{q:>14}: p50 {statistics.median(samples):7.2f} ms  "
+              f"p95 {samples[int(len(samples) * 0.95)]:7.2f} ms  "
+              f"{len(results):2d} results, top {top!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TOOL_TABLE_DB"] = str(Path(tmp) / "bench.db")
+        sys.path.insert(0, str(PROJECT_ROOT))
+        from app.database import init_db
+
+        asyncio.run(init_db())
+        total = populate(os.environ["TOOL_TABLE_DB"], args.nodes)
+        print(f"{total} nodes, {args.rounds} rounds per query")
+        asyncio.run(run(args.rounds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Link Scan Benchmark
+Serves links from local stub HTTP servers (fast, slow, 404, HEAD-not-allowed,
+hanging) and times a full scan probing one at a time versus concurrently,
+then checks the statuses recorded for each kind of link.
+
+Usage: python benchmarks/link_scan.py [--links 200] [--hosts 5] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Path -> status the scanner should record (0 = unreachable)
+EXPECTED = {"/ok": 200, "/slow": 200, "/missing": 404, "/no-head": 200, "/hang": 0}
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.2
+    hang = 3.0
+
+    def _respond(self, head: bool):
+        path = self.path.split("?")[0]
+        if path == "/slow":
+            time.sleep(self.delay)
+        elif path == "/hang":
+            time.sleep(self.hang)
+        if path == "/missing":
+            status = 404
+        elif path == "/no-head" and head:
+            status = 405
+        else:
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def log_message(self, *args):
+        pass
+
+def start_servers(count: int):
+    servers = []
+    for _ in range(count):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+def populate(db_path: str, ports: list, links: int) -> dict:
+    """Insert link nodes spread over the stub hosts; return url -> expected status"""
+    paths = list(EXPECTED)
+    expected, rows = {}, []
+    for i in range(links):
+        path = paths[i % len(paths)]
+        url = f"http://127.0.0.1:{ports[(i // len(paths)) % len(ports)]}{path}?n={i}"
+        expected[url] = EXPECTED[path]
+        rows.append((f"stub {i}", url, f"l-{i}"))
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO nodes (name, node_type, url, code) VALUES (?, 'link', ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return expected
+
+async def run(args, expected: dict):
+    from app import linkcheck
+    from app.database import get_db
+    from app.writer import writer
+
+    await writer.start()
+    try:
+        timings = {}
+        for label, concurrency, per_host in (
+            ("sequential", 1, 1),
+            ("concurrent", args.concurrency, args.per_host),
+        ):
+            prober = linkcheck.Prober(timeout=args.timeout, concurrency=concurrency, per_host=per_host)
+            summary = await linkcheck.scan(prober)
+            timings[label] = summary["seconds"]
+            print(f"{label:>11}: {summary['seconds']:6.2f}s for {summary['urls']} URLs "
+                  f"({summary['dead']} dead, {summary['changed']} changed)")
+        print(f"    speedup: {timings['sequential'] / timings['concurrent']:.1f}x")
+
+        db = await get_db()
+        try:
+            cursor = await db.execute("SELECT url, status FROM link_status")
+            recorded = {row['url']: row['status'] for row in await cursor.fetchall()}
+        finally:
+            await db.close()
+        wrong = {url: (recorded.get(url), status) for url, status in expected.items() if recorded.get(url) != status}
+        assert not wrong, f"unexpected statuses: {list(wrong.items())[:5]}"
+        print(f"  all {len(expected)} statuses as expected")
+    finally:
+        await writer.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--links", type=int, default=200)
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.2, help="seconds the /slow links take")
+    parser.add_argument("--timeout", type=float, default=0.5, help="probe timeout; /hang links exceed it")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-host", type=int, default=8)
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.hang = args.timeout * 2
+    servers = start_servers(args.hosts)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["TOOL_TABLE_DB"] = str(Path(tmp) / "bench.db")
+            sys.path.insert(0, str(PROJECT_ROOT))
+            from app.database import init_db
+
+            asyncio.run(init_db())
+            expected = populate(os.environ["TOOL_TABLE_DB"], [s.server_address[1] for s in servers], args.links)
+            asyncio.run(run(args, expected))
+    finally:
+        for server in servers:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Search Cache Benchmark
+Fills a temporary database with a synthetic tree and times repeated portal
+queries through search_nodes with the result cache cleared (every call runs
+the LIKE scan and path lookups) and warm.
+
+Usage: python benchmarks/search_cache.py [--nodes 20000] [--rounds 50]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+QUERIES = ["台北", "ssh", "jump", "SSH", "監控"]
+WORDS = ["台北", "台中", "高雄", "ssh", "jump", "監控", "備份", "web", "db", "vpn"]
+
+def populate(db_path: str, count: int):
+    """Insert a three-level tree of `count` nodes"""
+    conn = sqlite3.connect(db_path)
+    rows = []
+    next_id = 1
+    per_folder = max(1, int(count ** (1 / 3)))
+    for i in range(per_folder):
+        root = next_id
+        rows.append((root, None, f"{WORDS[i % len(WORDS)]} 區域 {i}", "folder", None, f"{i + 1}"))
+        next_id += 1
+        for j in range(per_folder):
+            folder = next_id
+            rows.append((folder, root, f"{WORDS[j % len(WORDS)]} 群組 {j}", "folder", None, f"{i + 1}-{j + 1}"))
+            next_id += 1
+            for k in range(per_folder):
+                rows.append((next_id, folder, f"{WORDS[(i + j + k) % len(WORDS)]} 主機 {next_id}",
+                             "link", f"https://h{next_id}.example", f"{i + 1}-{j + 1}-{k + 1}"))
+                next_id += 1
+    conn.executemany(
+        "INSERT INTO nodes (id, parent_id, name, node_type, url, code) VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+async def run(rounds: int):
+    from app.routes import search
+
+    async def timed(warm: bool) -> list:
+        samples = []
+        for _ in range(rounds):
+            for q in QUERIES:
+                if not warm:
+                    search.cache.clear()
+                start = time.perf_counter()
+                await search.search_nodes(q=q, limit=50)
+                samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    cold = await timed(warm=False)
+    await timed(warm=True)  # Prime
+    warm = await timed(warm=True)
+    for label, samples in (("uncached", cold), ("cached", warm)):
+        samples.sort()
+        print(f"{label:>9}: p50 {statistics.median(samples):8.3f} ms  "
+              f"p95 {samples[int(len(samples) * 0.95)]:8.3f} ms")
+    print(f"  speedup: {statistics.median(cold) / statistics.median(warm):.0f}x (p50)")
+    print(f"    cache: {search.cache.stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TOOL_TABLE_DB"] = str(Path(tmp) / "bench.db")
+        sys.path.insert(0, str(PROJECT_ROOT))
+        from app.database import init_db
+
+        asyncio.run(init_db())
+        total = populate(os.environ["TOOL_TABLE_DB"], args.nodes)
+        print(f"{total} nodes, {len(QUERIES)} queries x {args.rounds} rounds")
+        asyncio.run(run(args.rounds))
+
+if __name__ == "__main__":
+    main()
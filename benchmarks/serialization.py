@@ -0,0 +1,80 @@
+"""
+Node Serialization Benchmark
+Times turning node rows into a JSON body per 10k rows, the way FastAPI does
+with response_model (dict rows validated and dumped through NodeResponse)
+versus the lean path (typed NodeRow objects built on the database thread).
+
+Usage: python benchmarks/serialization.py [--rows 10000] [--rounds 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+async def run(rows: int, rounds: int):
+    from pydantic import TypeAdapter
+    from app.database import get_db
+    from app.models import NodeResponse
+    from app.serialize import NODE_COLUMNS, fetch_nodes, encode
+
+    adapter = TypeAdapter(List[NodeResponse])
+    query = f"SELECT {NODE_COLUMNS} FROM nodes ORDER BY id"
+
+    async def pydantic_path(db) -> bytes:
+        cursor = await db.execute(query)
+        data = [dict(row) for row in await cursor.fetchall()]
+        content = adapter.dump_python(adapter.validate_python(data), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    async def lean_path(db) -> bytes:
+        return encode([row.as_dict() for row in await fetch_nodes(db, query)])
+
+    db = await get_db()
+    try:
+        assert await pydantic_path(db) == await lean_path(db), "outputs differ"
+        per_10k = 10000 / rows
+        results = {}
+        for label, fn in (("pydantic", pydantic_path), ("lean", lean_path)):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await fn(db)
+                samples.append((time.perf_counter() - start) * 1000 * per_10k)
+            results[label] = statistics.median(samples)
+            print(f"{label:>9}: {results[label]:7.1f} ms per 10k rows (median of {rounds})")
+        print(f"  speedup: {results['pydantic'] / results['lean']:.1f}x, identical output")
+    finally:
+        await db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TOOL_TABLE_DB"] = str(Path(tmp) / "bench.db")
+        sys.path.insert(0, str(PROJECT_ROOT))
+        from app.database import init_db
+
+        asyncio.run(init_db())
+        import sqlite3
+        conn = sqlite3.connect(os.environ["TOOL_TABLE_DB"])
+        conn.executemany(
+            "INSERT INTO nodes (name, node_type, url, icon, code) VALUES (?, 'link', ?, ?, ?)",
+            [(f"主機 {i}", f"https://h{i}.example", "server.png", f"b-{i}") for i in range(args.rows)]
+        )
+        conn.commit()
+        conn.close()
+        asyncio.run(run(args.rows, args.rounds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Multi-Portal Benchmark
+Creates many tenant databases and requests them round-robin through the app
+with a small open-tenant limit, reporting the latency of a tenant's first
+request (open + warm-up) and of requests to open tenants, evictions, and the
+process's open file descriptors, which stay bounded by the limit rather than
+the number of portals.
+
+Usage: python benchmarks/tenants.py [--tenants 40] [--max-open 8] [--rounds 3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+async def run(args, names):
+    import httpx
+    from app.main import app
+    from app.tenancy import registry
+
+    cold, warm, peak_fds = [], [], 0
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            baseline = open_fds()
+            for round_no in range(args.rounds):
+                for name in names:
+                    for i in range(args.requests):
+                        is_open = name in registry.tenants
+                        start = time.perf_counter()
+                        response = await client.get(f"/t/{name}/api/nodes/tree")
+                        assert response.status_code == 200, response.text
+                        (warm if is_open else cold).append((time.perf_counter() - start) * 1000)
+                    peak_fds = max(peak_fds, open_fds())
+            stats = registry.stats()
+
+    print(f"  tenants: {len(names)}, max open: {args.max_open}, opened: {stats['opened']}, evicted: {stats['evicted']}")
+    if cold:
+        print(f"     cold: {statistics.median(cold):7.2f} ms (median first request, {len(cold)} opens)")
+    if warm:
+        print(f"     warm: {statistics.median(warm):7.2f} ms (median of {len(warm)} requests to open tenants)")
+    print(f"  open fds: {baseline} at start, {peak_fds} peak")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=40)
+    parser.add_argument("--max-open", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=5, help="requests per tenant visit")
+    parser.add_argument("--nodes", type=int, default=1000, help="nodes per tenant")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TOOL_TABLE_DB"] = str(Path(tmp) / "default.db")
+        os.environ["TOOL_TABLE_TENANTS_DIR"] = str(Path(tmp) / "tenants")
+        os.environ["TOOL_TABLE_MAX_TENANTS"] = str(args.max_open)
+        sys.path.insert(0, str(PROJECT_ROOT))
+        sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+        from app.tenancy import create
+        from search_cache import populate
+
+        names = [f"portal-{i:03d}" for i in range(args.tenants)]
+        for name in names:
+            populate(str(asyncio.run(create(name))), args.nodes)
+        print(f"Visiting {len(names)} tenants x {args.rounds} rounds, {args.requests} request(s) each")
+        asyncio.run(run(args, names))
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@
 
 let historyStack = [];
 let useAPI = true;  // Will be set to false if API is unavailable
+let bootstrapChildren = new Map();  // root code -> first-level items from /api/bootstrap
+let searchIndex = null;  // items of search-index.json, for static snapshot deployments
 
 // DOM Elements
 const grid = document.getElementById('grid');
@@ -19,8 +21,9 @@ const themeToggle = document.getElementById('theme-toggle');
 const htmlElement = document.documentElement;
 
 document.addEventListener('DOMContentLoaded', async () => {
-  // Check if API is available
-  await checkAPIAvailability();
+  // One request for roots, first-level children and auth links;
+  // also tells us whether the API is available
+  const boot = await loadBootstrap();
 
   // --- Theme Logic ---
   const savedTheme = localStorage.getItem('theme') || 'dark';
@@ -99,7 +102,9 @@ document.addEventListener('DOMContentLoaded', async () => {
   });
 
   // --- Init Data ---
-  loadAccessAuth();
+  if (boot) renderAccessAuth(boot.auth_links);
+  else loadAccessAuth();
+  subscribeLiveUpdates();
 
   // --- Hidden Admin Access (click clock 5 times rapidly) ---
   setupSecretAdminAccess();
@@ -132,6 +137,23 @@ function setupSecretAdminAccess() {
 }
 
 // ============ API Check ============
+async function loadBootstrap() {
+  try {
+    const res = await fetch('/api/bootstrap');
+    if (!res.ok) throw new Error('Bootstrap failed');
+    const boot = await res.json();
+    useAPI = true;
+    bootstrapChildren = new Map(
+      boot.roots.map(root => [root.code, boot.children[root.id] || []])
+    );
+    console.log('✓ API mode enabled');
+    return boot;
+  } catch (e) {
+    await checkAPIAvailability();
+    return null;
+  }
+}
+
 async function checkAPIAvailability() {
   try {
     const res = await fetch('/api/health');
@@ -147,6 +169,57 @@ async function checkAPIAvailability() {
   }
 }
 
+// ============ Live Updates ============
+function subscribeLiveUpdates() {
+  if (!useAPI || !window.EventSource) return;
+
+  const source = new EventSource('/api/events');
+  let lastVersion = null;
+  let nodesChanged = false;
+  let authChanged = false;
+  let timer = null;
+
+  const scheduleRefresh = () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => {
+      if (nodesChanged) refreshCurrentView();
+      if (authChanged) loadAccessAuth();
+      nodesChanged = authChanged = false;
+    }, 500);
+  };
+
+  // Sent on every (re)connect; a gap means we missed changes while away
+  source.addEventListener('hello', e => {
+    const { version } = JSON.parse(e.data);
+    if (lastVersion !== null && version !== lastVersion) {
+      nodesChanged = authChanged = true;
+      scheduleRefresh();
+    }
+    lastVersion = version;
+  });
+
+  source.addEventListener('change', e => {
+    const change = JSON.parse(e.data);
+    lastVersion = change.version;
+    if (change.op === 'reset') nodesChanged = authChanged = true;
+    else if (change.entity === 'auth_link') authChanged = true;
+    else nodesChanged = true;
+    scheduleRefresh();
+  });
+}
+
+function refreshCurrentView() {
+  bootstrapChildren.clear();
+
+  const keyword = document.getElementById('search-input').value.trim().toLowerCase();
+  if (keyword) {
+    searchByName(keyword);
+  } else if (historyStack.length > 0) {
+    const current = historyStack[historyStack.length - 1];
+    loadAndRender(current.code, current.file, false);
+  }
+}
+
 // ============ UI Helpers ============
 function toggleSidebar() {
   sidebar.classList.toggle('open');
@@ -185,7 +258,10 @@ async function loadAndRender(code, yamlFile, push = true) {
   try {
     let items = [];
 
-    if (useAPI) {
+    if (useAPI && bootstrapChildren.has(code)) {
+      // First level was delivered with /api/bootstrap
+      items = bootstrapChildren.get(code);
+    } else if (useAPI) {
       // Try API first
       const res = await fetch(`/api/nodes/code/${code}`);
       if (res.ok) {
@@ -229,9 +305,15 @@ async function searchByName(keyword) {
     let filtered = [];
 
     if (useAPI) {
-      const res = await fetch(`/api/search?q=${encodeURIComponent(keyword)}`);
-      if (res.ok) {
+      const res = await fetch(`/api/search?q=${encodeURIComponent(keyword)}`).catch(() => null);
+      if (res && res.ok) {
         filtered = await res.json();
+      } else {
+        // Static snapshot: search the exported index instead
+        const needle = keyword.toLowerCase();
+        filtered = (await loadSearchIndex()).filter(it =>
+          it.name.toLowerCase().includes(needle) || it.path.toLowerCase().includes(needle)
+        );
       }
     } else {
       // YAML fallback - gather all items
@@ -256,10 +338,12 @@ async function filterByIcon(icon) {
 
     if (useAPI) {
       // Search all and filter by icon
-      const res = await fetch('/api/nodes/tree');
-      if (res.ok) {
+      const res = await fetch('/api/nodes/tree').catch(() => null);
+      if (res && res.ok) {
         const tree = await res.json();
         filtered = flattenTree(tree).filter(it => it.icon === icon);
+      } else {
+        filtered = (await loadSearchIndex()).filter(it => it.icon === icon);
       }
     } else {
       const roots = ['1.yaml', '2.yaml', '3.yaml', '4.yaml'];
@@ -276,6 +360,19 @@ async function filterByIcon(icon) {
   }
 }
 
+// search-index.json from `python -m app.snapshot`, fetched once
+async function loadSearchIndex() {
+  if (!searchIndex) {
+    try {
+      const res = await fetch('search-index.json');
+      searchIndex = res.ok ? (await res.json()).items : [];
+    } catch (e) {
+      searchIndex = [];
+    }
+  }
+  return searchIndex;
+}
+
 function flattenTree(nodes) {
   let result = [];
   nodes.forEach(node => {
@@ -334,6 +431,13 @@ function renderGrid(items) {
     name.textContent = item.name;
     card.appendChild(name);
 
+    // Last link-health probe: 0 = unreachable, 4xx/5xx other than login pages
+    const status = item.link_status;
+    if (status === 0 || (status >= 400 && status !== 401 && status !== 403)) {
+      card.classList.add('link-dead');
+      card.title = status === 0 ? '連結無法連線' : `連結異常 (HTTP ${status})`;
+    }
+
     // For API items
     if (item.node_type === 'folder' || item.file) {
       card.addEventListener('click', () => {
@@ -342,7 +446,11 @@ function renderGrid(items) {
         loadAndRender(code, file);
       });
     } else if (item.node_type === 'link' || item.url) {
-      card.addEventListener('click', () => window.open(item.url, '_blank'));
+      card.addEventListener('click', () => {
+        // Fire-and-forget click count for popularity sorting
+        if (useAPI && item.id) navigator.sendBeacon(`/api/nodes/${item.id}/hit`);
+        window.open(item.url, '_blank');
+      });
     }
 
     fragment.appendChild(card);
@@ -353,37 +461,38 @@ function renderGrid(items) {
 
 // ============ Auth Links ============
 function loadAccessAuth() {
-  const authGrid = document.getElementById('auth-grid');
-
   if (useAPI) {
     // Try API
     fetch('/api/auth-links')
       .then(r => r.json())
-      .then(groups => {
-        authGrid.innerHTML = '';
-        const fragment = document.createDocumentFragment();
-
-        groups.forEach(group => {
-          group.items.forEach(it => {
-            const card = document.createElement('div');
-            card.className = 'grid-item';
-            const a = document.createElement('a');
-            a.href = it.url;
-            a.target = '_blank';
-            a.textContent = `${group.region} – ${it.name}`;
-            card.appendChild(a);
-            fragment.appendChild(card);
-          });
-        });
-
-        authGrid.appendChild(fragment);
-      })
+      .then(renderAccessAuth)
       .catch(() => loadAccessAuthFromYAML());
   } else {
     loadAccessAuthFromYAML();
   }
 }
 
+function renderAccessAuth(groups) {
+  const authGrid = document.getElementById('auth-grid');
+  authGrid.innerHTML = '';
+  const fragment = document.createDocumentFragment();
+
+  groups.forEach(group => {
+    group.items.forEach(it => {
+      const card = document.createElement('div');
+      card.className = 'grid-item';
+      const a = document.createElement('a');
+      a.href = it.url;
+      a.target = '_blank';
+      a.textContent = `${group.region} – ${it.name}`;
+      card.appendChild(a);
+      fragment.appendChild(card);
+    });
+  });
+
+  authGrid.appendChild(fragment);
+}
+
 function loadAccessAuthFromYAML() {
   fetch('resource/AccessInternetAuth.yaml')
     .then(r => r.text())